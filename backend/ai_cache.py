@@ -0,0 +1,264 @@
+"""
+Cache backends for AI responses
+A bounded in-memory LRU (max entries / max bytes) layered over a SQLite table
+with an indexed expiry column. The SQLite layer survives restarts and is
+shared by all uvicorn workers; expired rows are removed by purge_expired,
+which the app runs periodically in the background. The SQLite calls block,
+so async callers run them in a worker thread.
+"""
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from .config import config
+    from .metrics import sqlite_timer
+except ImportError:
+    from config import config
+    from metrics import sqlite_timer
+
+
+class CacheBackend(ABC):
+    """Key/value cache with a TTL per entry (values must be JSON serializable)"""
+
+    @abstractmethod
+    def get(self, cache_key: str) -> Optional[Any]:
+        """Value, or None if missing or expired"""
+
+    @abstractmethod
+    def put(self, cache_key: str, value: Any, ttl_seconds: float):
+        """Store a value for ttl_seconds"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove all entries"""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Remove expired entries, returns how many were removed"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Size and counters"""
+
+
+class MemoryLRUCache(CacheBackend):
+    """LRU bounded by entry count and by the JSON size of the values"""
+
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, cache_key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.time():
+                self._remove(cache_key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            return value
+
+    def put(self, cache_key: str, value: Any, ttl_seconds: float):
+        self.store(cache_key, value, time.time() + ttl_seconds)
+
+    def store(self, cache_key: str, value: Any, expires_at: float):
+        """Store a value with an absolute expiry time"""
+        size = len(json.dumps(value))
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            if size > self.max_bytes:
+                return
+            self._entries[cache_key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, cache_key: str):
+        _, _, size = self._entries.pop(cache_key)
+        self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCache(CacheBackend):
+    """Cache table in SQLite, indexed on expiry so purging doesn't scan the table"""
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        self.purged = 0
+        self.init_db()
+
+    def get_connection(self):
+        """Get database connection"""
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def init_db(self):
+        """Initialize database schema for cached AI responses"""
+        conn = self.get_connection()
+        # Concurrent readers while another worker writes
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_ai_cache_expires ON ai_cache(expires_at)')
+        conn.commit()
+        conn.close()
+
+    def get_with_expiry(self, cache_key: str) -> Optional[Tuple[Any, float]]:
+        """Value and expiry time, or None if missing or expired"""
+        with sqlite_timer():
+            conn = self.get_connection()
+            row = conn.execute(
+                'SELECT value, expires_at FROM ai_cache WHERE cache_key = ? AND expires_at > ?',
+                (cache_key, time.time())
+            ).fetchone()
+            conn.close()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get(self, cache_key: str) -> Optional[Any]:
+        entry = self.get_with_expiry(cache_key)
+        return entry[0] if entry else None
+
+    def put(self, cache_key: str, value: Any, ttl_seconds: float):
+        with sqlite_timer():
+            conn = self.get_connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO ai_cache (cache_key, value, expires_at) VALUES (?, ?, ?)',
+                (cache_key, json.dumps(value), time.time() + ttl_seconds)
+            )
+            conn.commit()
+            conn.close()
+
+    def clear(self):
+        conn = self.get_connection()
+        conn.execute('DELETE FROM ai_cache')
+        conn.commit()
+        conn.close()
+
+    def purge_expired(self) -> int:
+        conn = self.get_connection()
+        removed = conn.execute('DELETE FROM ai_cache WHERE expires_at <= ?', (time.time(),)).rowcount
+        conn.commit()
+        conn.close()
+        self.purged += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self.get_connection()
+        size = conn.execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0]
+        conn.close()
+        return {"size": size, "purged": self.purged}
+
+
+class LayeredCache(CacheBackend):
+    """Memory LRU in front of an optional SQLite layer, with hit/miss counters"""
+
+    def __init__(self, memory: MemoryLRUCache, persistent: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cache_key: str) -> Optional[Any]:
+        value = self.memory.get(cache_key)
+        if value is None and self.persistent is not None:
+            entry = self.persistent.get_with_expiry(cache_key)
+            if entry is not None:
+                value, expires_at = entry
+                # Keep the original expiry when promoting to memory
+                self.memory.store(cache_key, value, expires_at)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, cache_key: str, value: Any, ttl_seconds: float):
+        self.memory.put(cache_key, value, ttl_seconds)
+        if self.persistent is not None:
+            self.persistent.put(cache_key, value, ttl_seconds)
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def purge_expired(self) -> int:
+        removed = self.memory.purge_expired()
+        if self.persistent is not None:
+            removed += self.persistent.purge_expired()
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "memory": self.memory.get_stats(),
+            "persistent": self.persistent.get_stats() if self.persistent is not None else None,
+        }
+
+
+# Singleton instance (first used from several worker threads at once)
+_ai_cache_instance = None
+_ai_cache_lock = threading.Lock()
+
+
+def get_ai_cache() -> LayeredCache:
+    """Get singleton AI response cache"""
+    global _ai_cache_instance
+    with _ai_cache_lock:
+        if _ai_cache_instance is None:
+            memory = MemoryLRUCache(max_entries=config.AI_CACHE_MAX_ENTRIES, max_bytes=config.AI_CACHE_MAX_BYTES)
+            persistent = SQLiteCache(Path(__file__).parent / "ai_cache.db") if config.AI_CACHE_PERSIST else None
+            _ai_cache_instance = LayeredCache(memory, persistent)
+    return _ai_cache_instance
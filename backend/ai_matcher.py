@@ -3,32 +3,125 @@ AI-powered semantic matching engine using Claude API
 Provides intelligent matching of construction work items
 """
 import json
+import time
+import asyncio
+import threading
 import hashlib
+from contextlib import nullcontext
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
 
 try:
-    from anthropic import Anthropic
+    from anthropic import AsyncAnthropic
     ANTHROPIC_AVAILABLE = True
 except ImportError:
     ANTHROPIC_AVAILABLE = False
-    Anthropic = None
+    AsyncAnthropic = None
 
 from config import config
+from ai_cache import get_ai_cache
 
+# Process-wide API client (keeps its HTTP connections alive between calls)
+_ai_client = None
+_ai_client_loop = None
+# Task on the client's event loop that closes the client when cancelled
+_ai_client_closer = None
 
-# In-memory cache for AI responses
-_ai_cache: Dict[str, Tuple[Any, datetime]] = {}
+
+async def _close_on_cancel(client: "AsyncAnthropic"):
+    """
+    Wait until cancelled, then close the client on its own event loop
+    asyncio.run (and uvicorn) cancel pending tasks before closing the loop,
+    so the client's connections are closed while their loop still runs
+    """
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.close()
+
+
+def get_ai_client() -> "AsyncAnthropic":
+    """
+    Get the shared async Claude client, created on first use
+    A new client is made when called from another event loop (e.g. after
+    asyncio.run in a script), as connections can't move between loops;
+    the old client is closed on its own loop
+    """
+    global _ai_client, _ai_client_loop, _ai_client_closer
+    loop = asyncio.get_running_loop()
+    if _ai_client is None or _ai_client_loop is not loop:
+        if _ai_client_closer is not None and not _ai_client_loop.is_closed():
+            # A closed loop already cancelled (and ran) its closer on shutdown
+            _ai_client_loop.call_soon_threadsafe(_ai_client_closer.cancel)
+        _ai_client = AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY, timeout=config.AI_TIMEOUT_SECONDS)
+        _ai_client_loop = loop
+        _ai_client_closer = loop.create_task(_close_on_cancel(_ai_client))
+    return _ai_client
+
+
+async def close_ai_client():
+    """Close the shared client and its connections (app shutdown)"""
+    global _ai_client, _ai_client_loop, _ai_client_closer
+    if _ai_client is None:
+        return
+    closer, loop = _ai_client_closer, _ai_client_loop
+    _ai_client, _ai_client_loop, _ai_client_closer = None, None, None
+    if loop is asyncio.get_running_loop():
+        closer.cancel()
+        await asyncio.gather(closer, return_exceptions=True)
+    elif not loop.is_closed():
+        loop.call_soon_threadsafe(closer.cancel)
+
+
+async def _create_message(
+    prompt: str,
+    max_tokens: int,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    deadline: Optional[float] = None
+):
+    """
+    One API call, holding a slot of the semaphore (if given) and limited to
+    AI_TIMEOUT_SECONDS and the deadline (time.perf_counter() value, if given)
+    Raises asyncio.TimeoutError when the time is up
+    """
+    async with semaphore if semaphore is not None else nullcontext():
+        timeout = config.AI_TIMEOUT_SECONDS
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.perf_counter())
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+
+        return await asyncio.wait_for(
+            get_ai_client().messages.create(
+                model=config.AI_MODEL,
+                max_tokens=max_tokens,
+                timeout=config.AI_TIMEOUT_SECONDS,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            ),
+            timeout
+        )
+
+
+def _past(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.perf_counter() >= deadline
+
+
+def _line_cache_key(werkzaamheid: Dict[str, Any]) -> str:
+    """Cache key of a line: normalized omschrijving and eenheid"""
+    # Imported here: matcher imports this module
+    from matcher import line_key
+    return hashlib.md5(json.dumps({"l": line_key(werkzaamheid)}).encode()).hexdigest()
 
 
 def _get_cache_key(werkzaamheid: Dict[str, Any], candidates: List[Dict[str, Any]]) -> str:
-    """Generate cache key from werkzaamheid and candidates"""
+    """Cache key of a line and its candidate set (order doesn't matter, fuzzy scores may reorder it)"""
+    from matcher import line_key
     data = {
-        "w": werkzaamheid.get("omschrijving", ""),
-        "e": werkzaamheid.get("eenheid", ""),
-        "c": [c.get("code", "") for c in candidates]
+        "l": line_key(werkzaamheid),
+        "c": sorted({c.get("code", "") for c in candidates})
     }
-    return hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    return hashlib.md5(json.dumps(data).encode()).hexdigest()
 
 
 def _get_cached_response(cache_key: str) -> Optional[Dict[str, Any]]:
@@ -36,27 +129,73 @@ def _get_cached_response(cache_key: str) -> Optional[Dict[str, Any]]:
     if not config.CACHE_ENABLED:
         return None
 
-    if cache_key in _ai_cache:
-        response, timestamp = _ai_cache[cache_key]
-        if datetime.now() - timestamp < timedelta(hours=config.CACHE_TTL_HOURS):
-            return response
+    try:
+        return get_ai_cache().get(cache_key)
+    except Exception as e:
+        print(f"Error reading AI cache: {e}")
+        return None
+
+
+def _cache_response(cache_key: str, response: Dict[str, Any]):
+    """Cache AI response"""
+    if not config.CACHE_ENABLED:
+        return
+
+    try:
+        get_ai_cache().put(cache_key, response, config.CACHE_TTL_HOURS * 3600)
+    except Exception as e:
+        print(f"Error writing AI cache: {e}")
 
-        # Expired, remove from cache
-        del _ai_cache[cache_key]
 
+# Lookups of cached verdicts: same candidate set, reused for another candidate set, or miss
+_lookup_stats = {"exact_hits": 0, "reused_hits": 0, "misses": 0}
+_lookup_lock = threading.Lock()
+
+
+def _get_cached_match(werkzaamheid: Dict[str, Any], candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Cached verdict for a line, with best_match_index pointing into these candidates
+    Looks up the line with the same candidate set first, then the last verdict
+    for the line, which is reused when its chosen code is one of the candidates
+    """
+    if not config.CACHE_ENABLED:
+        return None
+
+    codes = [c.get("code", "") for c in candidates]
+    lookups = (
+        ("exact_hits", _get_cache_key(werkzaamheid, candidates)),
+        ("reused_hits", _line_cache_key(werkzaamheid)),
+    )
+    for counter, cache_key in lookups:
+        cached = _get_cached_response(cache_key)
+        if cached and cached.get("code") in codes:
+            with _lookup_lock:
+                _lookup_stats[counter] += 1
+            return {
+                "best_match_index": codes.index(cached["code"]),
+                "confidence": cached["confidence"],
+                "reasoning": cached["reasoning"]
+            }
+
+    with _lookup_lock:
+        _lookup_stats["misses"] += 1
     return None
 
 
-def _cache_response(cache_key: str, response: Dict[str, Any]):
-    """Cache AI response"""
-    if config.CACHE_ENABLED:
-        _ai_cache[cache_key] = (response, datetime.now())
+def _cache_match(werkzaamheid: Dict[str, Any], candidates: List[Dict[str, Any]], ai_result: Dict[str, Any]):
+    """Cache a verdict by the chosen code (not its position), under the candidate set and the line"""
+    code = candidates[ai_result["best_match_index"]].get("code")
+    if not code:
+        return
+
+    verdict = {"code": code, "confidence": ai_result["confidence"], "reasoning": ai_result["reasoning"]}
+    _cache_response(_get_cache_key(werkzaamheid, candidates), verdict)
+    _cache_response(_line_cache_key(werkzaamheid), verdict)
 
 
 def clear_cache():
     """Clear the AI response cache"""
-    global _ai_cache
-    _ai_cache = {}
+    get_ai_cache().clear()
 
 
 def build_matching_prompt(
@@ -113,12 +252,61 @@ waarbij best_match_index het nummer is van de kandidaat (1-{len(candidates)}).
     return prompt
 
 
+def _extract_json_text(response_text: str) -> str:
+    """Response text without a surrounding markdown code block"""
+    response_text = response_text.strip()
+    if response_text.startswith("```"):
+        # Extract JSON from code block
+        lines = response_text.split("\n")
+        json_lines = []
+        in_json = False
+        for line in lines:
+            if line.startswith("```") and not in_json:
+                in_json = True
+                continue
+            elif line.startswith("```") and in_json:
+                break
+            elif in_json:
+                json_lines.append(line)
+        response_text = "\n".join(json_lines)
+    return response_text
+
+
+def _validate_ai_result(result: Any, candidate_count: int) -> Optional[Dict[str, Any]]:
+    """
+    Check one AI answer ({"best_match_index": 1-based, "confidence", "reasoning"})
+    Returns the result with a 0-based best_match_index, or None if it is invalid
+    """
+    # Validate response structure
+    if not isinstance(result, dict) or "best_match_index" not in result:
+        return None
+
+    try:
+        # Convert to 0-based index
+        best_index = int(result["best_match_index"]) - 1
+        confidence = float(result.get("confidence", 0.8))
+    except (TypeError, ValueError):
+        return None
+
+    if best_index < 0 or best_index >= candidate_count:
+        return None
+
+    return {
+        "best_match_index": best_index,
+        "confidence": confidence,
+        "reasoning": result.get("reasoning", "AI semantic match")
+    }
+
+
 async def ai_semantic_match(
     werkzaamheid: Dict[str, Any],
-    candidates: List[Dict[str, Any]]
+    candidates: List[Dict[str, Any]],
+    semaphore: Optional[asyncio.Semaphore] = None,
+    deadline: Optional[float] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Use Claude API to semantically match a werkzaamheid with the best candidate
+    The API call holds a slot of the semaphore and stops at the deadline (see _create_message)
 
     Returns:
         Dict with keys: best_match_index, confidence, reasoning
@@ -133,79 +321,202 @@ async def ai_semantic_match(
     if not candidates:
         return None
 
-    # Check cache first
-    cache_key = _get_cache_key(werkzaamheid, candidates)
-    cached = _get_cached_response(cache_key)
+    # Check cache first (the SQLite layer blocks, so off the event loop)
+    cached = await asyncio.to_thread(_get_cached_match, werkzaamheid, candidates)
     if cached:
         return cached
 
-    try:
-        client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
+    return await _request_ai_match(werkzaamheid, candidates, semaphore, deadline)
+
 
+async def _request_ai_match(
+    werkzaamheid: Dict[str, Any],
+    candidates: List[Dict[str, Any]],
+    semaphore: Optional[asyncio.Semaphore] = None,
+    deadline: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """Ask Claude for one werkzaamheid (no cache lookup) and cache the answer"""
+    try:
         prompt = build_matching_prompt(werkzaamheid, candidates)
 
-        message = client.messages.create(
-            model=config.AI_MODEL,
-            max_tokens=500,
-            timeout=config.AI_TIMEOUT_SECONDS,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        message = await _create_message(prompt, 500, semaphore, deadline)
 
         # Extract JSON from response
         response_text = message.content[0].text.strip()
 
         # Try to parse JSON response
         try:
-            # Handle potential markdown code blocks
-            if response_text.startswith("```"):
-                # Extract JSON from code block
-                lines = response_text.split("\n")
-                json_lines = []
-                in_json = False
-                for line in lines:
-                    if line.startswith("```") and not in_json:
-                        in_json = True
-                        continue
-                    elif line.startswith("```") and in_json:
-                        break
-                    elif in_json:
-                        json_lines.append(line)
-                response_text = "\n".join(json_lines)
-
-            result = json.loads(response_text)
-
-            # Validate response structure
-            if "best_match_index" not in result:
-                return None
-
-            # Convert to 0-based index
-            best_index = int(result["best_match_index"]) - 1
-            if best_index < 0 or best_index >= len(candidates):
-                return None
-
-            ai_result = {
-                "best_match_index": best_index,
-                "confidence": float(result.get("confidence", 0.8)),
-                "reasoning": result.get("reasoning", "AI semantic match")
-            }
-
-            # Cache the result
-            _cache_response(cache_key, ai_result)
-
-            return ai_result
-
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            result = json.loads(_extract_json_text(response_text))
+        except json.JSONDecodeError as e:
             print(f"Failed to parse AI response: {e}")
             print(f"Response was: {response_text}")
             return None
 
+        ai_result = _validate_ai_result(result, len(candidates))
+        if ai_result is None:
+            return None
+
+        # Cache the result
+        await asyncio.to_thread(_cache_match, werkzaamheid, candidates, ai_result)
+
+        return ai_result
+
+    except asyncio.TimeoutError:
+        # Running out of the caller's time budget is expected, not an error
+        if not _past(deadline):
+            print("AI matching timed out")
+        return None
     except Exception as e:
         print(f"AI matching error: {e}")
         return None
 
 
+def build_batch_matching_prompt(
+    items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]
+) -> str:
+    """
+    Build one prompt for several werkzaamheden, each with its own candidates
+    The instructions are sent once; the answer is a JSON array with one object per werkzaamheid
+    """
+    sections = []
+    for number, (werkzaamheid, candidates) in enumerate(items, 1):
+        candidates_text = "\n".join([
+            f"{i+1}. Code: {c.get('code', 'N/A')} | {c.get('omschrijving', 'N/A')} | "
+            f"{c.get('eenheid', 'N/A')} | €{c.get('prijs_per_stuk', 0):.2f}"
+            for i, c in enumerate(candidates)
+        ])
+        sections.append(
+            f"### WERKZAAMHEID {number}\n"
+            f"- Omschrijving: {werkzaamheid.get('omschrijving', 'N/A')}\n"
+            f"- Hoeveelheid: {werkzaamheid.get('hoeveelheid', 1)}\n"
+            f"- Eenheid: {werkzaamheid.get('eenheid', 'stu')}\n"
+            f"Kandidaten (1-{len(candidates)}):\n{candidates_text}"
+        )
+    werkzaamheden_text = "\n\n".join(sections)
+
+    prompt = f"""Je bent een expert in Nederlandse bouw- en renovatieterminologie.
+Je taak is om {len(items)} werkzaamheden uit een opnamerapport elk te matchen met de beste optie uit hun eigen lijst kandidaten uit een prijzenboek.
+
+INSTRUCTIES:
+1. Analyseer elke werkzaamheid en begrijp wat er precies bedoeld wordt
+2. Vergelijk met elke kandidaat van die werkzaamheid op basis van:
+   - Semantische betekenis (niet alleen tekst-overeenkomst)
+   - Type werkzaamheid (verwijderen, vervangen, schilderen, etc.)
+   - Materiaal of object (behang, kozijn, radiator, etc.)
+   - Eenheid compatibiliteit (m2, m1, stuks, etc.)
+3. Kies per werkzaamheid de beste match
+
+BELANGRIJK:
+- Een "gipsplaten wand plaatsen" kan matchen met "Gipsplaat aanbrengen" ook al zijn de woorden anders
+- "behang verwijderen" kan matchen met "wandbekleding verwijderen incl. lijmresten"
+- Let op de context van bouwwerkzaamheden
+
+{werkzaamheden_text}
+
+Geef je antwoord als JSON array met precies één object per werkzaamheid (alleen JSON, geen andere tekst):
+[
+  {{"id": 1, "best_match_index": 1, "confidence": 0.95, "reasoning": "Korte uitleg"}}
+]
+
+waarbij id het nummer van de werkzaamheid is en best_match_index het nummer van de kandidaat binnen die werkzaamheid.
+"""
+    return prompt
+
+
+def parse_batch_response(
+    response_text: str,
+    items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Validated result per item of a batched answer (None for items that are
+    missing or malformed)
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    try:
+        answers = json.loads(_extract_json_text(response_text))
+    except json.JSONDecodeError as e:
+        print(f"Failed to parse AI batch response: {e}")
+        return results
+
+    if not isinstance(answers, list):
+        return results
+
+    for position, answer in enumerate(answers):
+        # Answers refer to their werkzaamheid by id, or else by position
+        number = answer.get("id", position + 1) if isinstance(answer, dict) else None
+        try:
+            index = int(number) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < len(items) and results[index] is None:
+            results[index] = _validate_ai_result(answer, len(items[index][1]))
+
+    return results
+
+
+async def ai_semantic_match_batch(
+    items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+    semaphore: Optional[asyncio.Semaphore] = None,
+    deadline: Optional[float] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Match several werkzaamheden (each with its candidates) in one API call
+    Cached items are not sent; items the batched answer leaves missing or
+    malformed are retried one by one. Every API call (the batch and each
+    retry) holds its own slot of the semaphore and has its own timeout
+
+    Returns:
+        Per item the same result as ai_semantic_match (or None)
+    """
+    if not ANTHROPIC_AVAILABLE or not config.is_ai_available():
+        return [None] * len(items)
+
+    # Cache lookups of all items in one worker thread (the SQLite layer blocks)
+    results: List[Optional[Dict[str, Any]]] = await asyncio.to_thread(
+        lambda: [_get_cached_match(*item) if item[1] else None for item in items]
+    )
+    todo = [i for i, (_, candidates) in enumerate(items) if candidates and not results[i]]
+
+    if len(todo) == 1:
+        werkzaamheid, candidates = items[todo[0]]
+        results[todo[0]] = await _request_ai_match(werkzaamheid, candidates, semaphore, deadline)
+        return results
+
+    if todo:
+        batch = [items[i] for i in todo]
+        batch_results = [None] * len(batch)
+        try:
+            message = await _create_message(
+                build_batch_matching_prompt(batch), min(4096, 300 * len(batch)), semaphore, deadline
+            )
+            batch_results = parse_batch_response(message.content[0].text, batch)
+        except asyncio.TimeoutError:
+            if not _past(deadline):
+                print(f"AI batch matching timed out for {len(batch)} werkzaamheden")
+        except Exception as e:
+            print(f"AI batch matching error: {e}")
+
+        retries = []
+        answered = []
+        for i, ai_result in zip(todo, batch_results):
+            if ai_result is None:
+                retries.append(i)
+            else:
+                results[i] = ai_result
+                answered.append(i)
+
+        if answered:
+            await asyncio.to_thread(lambda: [_cache_match(*items[i], results[i]) for i in answered])
+
+        # Retry missing/malformed items individually
+        if retries:
+            retried = await asyncio.gather(*[_request_ai_match(*items[i], semaphore, deadline) for i in retries])
+            for i, ai_result in zip(retries, retried):
+                results[i] = ai_result
+
+    return results
+
+
 def ai_batch_match(
     werkzaamheden: List[Dict[str, Any]],
     prijzenboek: List[Dict[str, Any]],
@@ -213,32 +524,46 @@ def ai_batch_match(
 ) -> List[Optional[Dict[str, Any]]]:
     """
     Batch process multiple werkzaamheden for AI matching
-    This is a sync wrapper that could be optimized for batch API calls
+    Sync wrapper: sends AI_BATCH_SIZE werkzaamheden per API call, the calls run concurrently
 
     Args:
         werkzaamheden: List of work items to match
-        prijzenboek: Full prijzenboek list
-        get_candidates_func: Function to get top N candidates for a werkzaamheid
+        prijzenboek: Full prijzenboek list (or its PrijzenboekIndex)
+        get_candidates_func: Function to get top N candidates for a werkzaamheid,
+            called with the PrijzenboekIndex (built once) as second argument
 
     Returns:
         List of AI match results (or None for items that failed)
     """
-    import asyncio
+    # Imported here: matcher imports this module
+    from matcher import get_prijzenboek_index
+    index = get_prijzenboek_index(prijzenboek)
+    items = [(werkzaamheid, get_candidates_func(werkzaamheid, index)) for werkzaamheid in werkzaamheden]
+    batch_size = max(1, config.AI_BATCH_SIZE)
 
-    results = []
-    for werkzaamheid in werkzaamheden:
-        candidates = get_candidates_func(werkzaamheid, prijzenboek)
-        result = asyncio.run(ai_semantic_match(werkzaamheid, candidates))
-        results.append(result)
+    async def run():
+        semaphore = asyncio.Semaphore(max(1, config.AI_MAX_CONCURRENCY))
+        batches = await asyncio.gather(*[
+            ai_semantic_match_batch(items[start:start + batch_size], semaphore)
+            for start in range(0, len(items), batch_size)
+        ])
+        return [result for batch in batches for result in batch]
 
-    return results
+    return asyncio.run(run())
 
 
 def get_ai_stats() -> Dict[str, Any]:
     """Get statistics about AI matching"""
+    cache_stats = get_ai_cache().get_stats()
+    with _lookup_lock:
+        lookup_stats = dict(_lookup_stats)
+    lookups = sum(lookup_stats.values())
+    hits = lookup_stats["exact_hits"] + lookup_stats["reused_hits"]
+    cache_stats["lookups"] = {**lookup_stats, "hit_rate": (hits / lookups) if lookups else 0.0}
     return {
-        "cache_size": len(_ai_cache),
+        "cache_size": cache_stats["memory"]["size"],
         "ai_available": ANTHROPIC_AVAILABLE and config.is_ai_available(),
         "model": config.AI_MODEL if config.is_ai_available() else None,
         "cache_enabled": config.CACHE_ENABLED,
+        "cache": cache_stats,
     }
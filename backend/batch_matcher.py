@@ -0,0 +1,294 @@
+"""
+Batched matching engine
+Scores all opname lines against the whole prijzenboek at once
+(lines x items matrices) instead of one (line, item) pair at a time.
+Produces the same rankings as matcher.find_best_matches without token pruning.
+"""
+from bisect import bisect_right
+from typing import List, Dict, Any, Tuple
+
+try:
+    import numpy as np
+    from rapidfuzz import process
+    from rapidfuzz.distance import Indel
+    BATCH_ENGINE_AVAILABLE = True
+except ImportError:
+    BATCH_ENGINE_AVAILABLE = False
+    np = None
+    process = None
+    Indel = None
+
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    sparse = None
+
+try:
+    from .config import config
+    from .vector_engine import VECTOR_ENGINE_AVAILABLE, get_vector_index
+    from .matcher import (
+        PrijzenboekIndex, normalize_text, normalize_unit, keyword_tokens, exact_ids,
+        unit_score_normalized, _unit_partitioning_enabled, _unit_fallback_score
+    )
+except ImportError:
+    from config import config
+    from vector_engine import VECTOR_ENGINE_AVAILABLE, get_vector_index
+    from matcher import (
+        PrijzenboekIndex, normalize_text, normalize_unit, keyword_tokens, exact_ids,
+        unit_score_normalized, _unit_partitioning_enabled, _unit_fallback_score
+    )
+
+
+# Max opname lines per score matrix
+CHUNK_SIZE = 256
+
+# Max cells (lines x items) per score matrix, bounds memory for large prijzenboeken
+MAX_MATRIX_CELLS = 4_000_000
+
+
+def _item_units(index: PrijzenboekIndex):
+    """Distinct item units and the position of every item's unit among them (cached on the index)"""
+    if "batch_units" not in index.cache:
+        index.cache["batch_units"] = np.unique(np.array(index.units, dtype=object), return_inverse=True)
+    return index.cache["batch_units"]
+
+
+def _unit_scores(index: PrijzenboekIndex, query_units: List[str]) -> "np.ndarray":
+    """Unit score matrix (lines x items), computed once per distinct unit pair"""
+    item_units, inverse = _item_units(index)
+
+    rows = {}
+    for unit in set(query_units):
+        per_unit = np.array([unit_score_normalized(unit, item_unit) for item_unit in item_units], dtype=np.float64)
+        rows[unit] = per_unit[inverse]
+
+    return np.vstack([rows[unit] for unit in query_units])
+
+
+def _term_matrix(token_sets: List[set], vocabulary: Dict[str, int]):
+    """Binary document-term matrix (documents x vocabulary), sparse when scipy is available"""
+    rows, cols = [], []
+    for row, tokens in enumerate(token_sets):
+        for token in tokens:
+            col = vocabulary.get(token)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+
+    shape = (len(token_sets), len(vocabulary))
+    data = np.ones(len(rows), dtype=np.float64)
+    if SCIPY_AVAILABLE:
+        return sparse.csr_matrix((data, (rows, cols)), shape=shape)
+
+    matrix = np.zeros(shape, dtype=np.float64)
+    matrix[rows, cols] = data
+    return matrix
+
+
+def _item_term_matrix(index: PrijzenboekIndex):
+    """Vocabulary, transposed item term matrix and token counts (cached on the index)"""
+    if "batch_terms" not in index.cache:
+        vocabulary = {}
+        for tokens in index.tokens:
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
+        item_terms = _term_matrix(index.tokens, vocabulary).T
+        if SCIPY_AVAILABLE:
+            item_terms = item_terms.tocsc()
+        item_counts = np.array([len(tokens) for tokens in index.tokens], dtype=np.float64)
+        index.cache["batch_terms"] = (vocabulary, item_terms, item_counts)
+    return index.cache["batch_terms"]
+
+
+def _keyword_scores(index: PrijzenboekIndex, query_tokens: List[set]) -> "np.ndarray":
+    """
+    Keyword score matrix (lines x items), same formula as keyword_score_from_tokens
+    Overlap counts for all pairs come from one (sparse) matrix product
+    """
+    vocabulary, item_terms, item_counts = _item_term_matrix(index)
+
+    overlap = _term_matrix(query_tokens, vocabulary) @ item_terms
+    if SCIPY_AVAILABLE:
+        overlap = overlap.toarray()
+
+    # Query size includes tokens that appear nowhere in the prijzenboek
+    query_counts = np.array([len(tokens) for tokens in query_tokens], dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Weighted average (favor query coverage)
+        scores = (overlap / query_counts[:, None]) * 0.7 + (overlap / item_counts[None, :]) * 0.3
+
+    # Empty keyword sets score 0 (no overlap is 0 too, and avoids 0/0)
+    scores[overlap == 0] = 0.0
+    return scores
+
+
+def _substring_lengths(index: PrijzenboekIndex) -> List[int]:
+    """Distinct lengths of the normalized omschrijvingen, ascending (cached on the index)"""
+    if "substring_lengths" not in index.cache:
+        index.cache["substring_lengths"] = sorted({len(target_norm) for target_norm in index.normalized})
+    return index.cache["substring_lengths"]
+
+
+def _substring_bonus(index: PrijzenboekIndex, query_norms: List[str]) -> "np.ndarray":
+    """
+    Substring bonus matrix (lines x items): 0.15 where the line contains the item
+    text or the other way around, like fuzzy_score_prepared
+    Items containing a line must contain each of its trigrams, so only the items
+    of its rarest trigram are checked; item texts contained in a line are found
+    by looking up the windows of the line that have the length of some item text
+    """
+    postings, _ = index.trigram_postings()
+    lengths = _substring_lengths(index)
+    exact = exact_ids(index)
+    bonus = np.zeros((len(query_norms), len(index.items)), dtype=np.float64)
+
+    for row, query_norm in enumerate(query_norms):
+        if len(query_norm) < 3:
+            candidates = range(len(index.items))
+        else:
+            candidates = min(
+                (postings.get(query_norm[i:i + 3], ()) for i in range(len(query_norm) - 2)),
+                key=len
+            )
+        cols = [i for i in candidates if query_norm in index.normalized[i]]
+
+        windows = set()
+        for length in lengths[:bisect_right(lengths, len(query_norm))]:
+            windows.update(query_norm[i:i + length] for i in range(len(query_norm) - length + 1))
+        for window in windows:
+            ids = exact.get(window)
+            if ids:
+                cols.extend(ids)
+
+        bonus[row, cols] = 0.15
+
+    return bonus
+
+
+def _text_scores(
+    index: PrijzenboekIndex,
+    query_texts: List[str],
+    query_norms: List[str],
+    query_tokens: List[set]
+) -> "np.ndarray":
+    """Text score matrix (lines x items), same formula as fuzzy_score_prepared (plus the vector score)"""
+    levenshtein = process.cdist(
+        query_norms, index.normalized,
+        scorer=Indel.normalized_similarity,
+        dtype=np.float64,
+        workers=-1
+    )
+    best = np.maximum(levenshtein, _keyword_scores(index, query_tokens) * 1.2)
+
+    # Vector engine similarity as an alternative text score
+    vectors = get_vector_index(index) if VECTOR_ENGINE_AVAILABLE and config.VECTOR_ENGINE_ENABLED else None
+    if vectors is not None:
+        # One matrix-vector product per line, so scores equal the standard engine's
+        best = np.maximum(best, np.vstack([vectors.scores(text) for text in query_texts]))
+
+    text = np.minimum(1.0, best + _substring_bonus(index, query_norms))
+
+    # Exact match
+    exact = exact_ids(index)
+    for row, query_norm in enumerate(query_norms):
+        cols = exact.get(query_norm)
+        if cols:
+            text[row, cols] = 1.0
+
+    return text
+
+
+def _top_n(scores: "np.ndarray", top_n: int) -> "np.ndarray":
+    """Ids of the top N scores, ties in prijzenboek order (like a stable sort)"""
+    if top_n < len(scores):
+        part = np.argpartition(-scores, top_n - 1)[:top_n]
+        ids = np.flatnonzero(scores >= scores[part].min())
+    else:
+        ids = np.arange(len(scores))
+    order = np.lexsort((ids, -scores[ids]))
+    return ids[order][:top_n]
+
+
+def find_best_matches_batch(
+    werkzaamheden: List[Dict[str, Any]],
+    index: PrijzenboekIndex,
+    top_n: int = 5
+) -> List[List[tuple]]:
+    """
+    Find top N best matches for every werkzaamheid at once
+    Returns one list of (prijzenboek_item, score, text_score, unit_score)
+    tuples per werkzaamheid, in input order
+    """
+    return [matches for matches, _ in find_best_matches_batch_with_info(werkzaamheden, index, top_n=top_n)]
+
+
+def prepare_index(index: PrijzenboekIndex):
+    """Build the per-prijzenboek matrices and lookups of this engine ahead of the first match"""
+    if not BATCH_ENGINE_AVAILABLE:
+        return
+    _item_units(index)
+    _item_term_matrix(index)
+    _substring_lengths(index)
+    index.trigram_postings()
+    exact_ids(index)
+
+
+def find_best_matches_batch_with_info(
+    werkzaamheden: List[Dict[str, Any]],
+    index: PrijzenboekIndex,
+    top_n: int = 5
+) -> List[Tuple[List[tuple], Dict[str, Any]]]:
+    """
+    Same as find_best_matches_batch, with one (matches, search_info) pair
+    per werkzaamheid like matcher.find_best_matches_with_info
+    """
+    if not BATCH_ENGINE_AVAILABLE:
+        raise RuntimeError("Batch matcher engine requires numpy and rapidfuzz")
+
+    if not index.items:
+        return [([], {"unit_fallback": False, "items_scored": 0}) for _ in werkzaamheden]
+
+    partitioning = _unit_partitioning_enabled()
+    fallback_score = _unit_fallback_score()
+    chunk_size = max(1, min(CHUNK_SIZE, MAX_MATRIX_CELLS // len(index.items)))
+    results = []
+
+    for start in range(0, len(werkzaamheden), chunk_size):
+        chunk = werkzaamheden[start:start + chunk_size]
+
+        query_norms = [normalize_text(w.get("omschrijving", "")) for w in chunk]
+        query_tokens = [keyword_tokens(w.get("omschrijving", "")) for w in chunk]
+        query_units = [normalize_unit(w.get("eenheid", "")) for w in chunk]
+
+        text = _text_scores(index, [w.get("omschrijving", "") for w in chunk], query_norms, query_tokens)
+        unit = _unit_scores(index, query_units)
+
+        # Combined score (weighted)
+        # Text: 70%, Unit: 30%
+        combined = (text * 0.7) + (unit * 0.3)
+
+        for row in range(len(chunk)):
+            scores = combined[row]
+            unit_fallback = False
+
+            # Unit-compatible items only, unless they are too few or too weak
+            if partitioning:
+                compatible = unit[row] > 0
+                in_class = scores[compatible]
+                if len(in_class) < top_n or in_class.max(initial=0.0) < fallback_score:
+                    unit_fallback = True
+                else:
+                    scores = np.where(compatible, scores, -np.inf)
+
+            ids = _top_n(scores, top_n)
+            matches = [
+                (index.items[i], float(combined[row, i]), float(text[row, i]), float(unit[row, i]))
+                for i in ids
+            ]
+            items_scored = len(index.items) if unit_fallback or not partitioning else int(compatible.sum())
+            results.append((matches, {"unit_fallback": unit_fallback, "items_scored": items_scored}))
+
+    return results
@@ -0,0 +1 @@
+# Matcher benchmarks and evaluation tools (run from the backend directory)
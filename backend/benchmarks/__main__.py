@@ -0,0 +1,7 @@
+"""Run the matcher benchmark: python -m benchmarks --help (from the backend directory)"""
+try:
+    from .matcher_benchmark import main
+except ImportError:
+    from benchmarks.matcher_benchmark import main
+
+main()
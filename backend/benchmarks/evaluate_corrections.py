@@ -0,0 +1,242 @@
+"""
+Offline matcher evaluation
+Replays the user corrections in corrections.db (match_corrections) through
+match_werkzaamheden with learning disabled and reports top-1/top-5 accuracy
+and per-line latency, optionally for two engine configurations side by side.
+
+Usage (from the backend directory):
+    python -m benchmarks.evaluate_corrections
+    python -m benchmarks.evaluate_corrections \\
+        --config baseline:MATCHER_ENGINE=standard,CANDIDATE_PRUNING_ENABLED=false \\
+        --config batch:MATCHER_ENGINE=batch
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+try:
+    from ..config import config
+    from ..corrections_db import CorrectionsDB
+    from ..matcher import PrijzenboekIndex, match_werkzaamheden
+    from .synthetic import load_prijzenboek
+except ImportError:
+    from config import config
+    from corrections_db import CorrectionsDB
+    from matcher import PrijzenboekIndex, match_werkzaamheden
+    from benchmarks.synthetic import load_prijzenboek
+
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+def load_gold_labels(db_path: Path = BACKEND_DIR / "corrections.db") -> List[Dict[str, Any]]:
+    """
+    One case per (opname text, eenheid): the code users chose most often,
+    the same pick find_learned_match would make
+    """
+    corrections = CorrectionsDB(str(db_path)).export_corrections()
+    corrections.sort(key=lambda c: (c["frequency"], c["last_used"] or ""), reverse=True)
+
+    cases = {}
+    for correction in corrections:
+        key = (correction["opname_text"], correction["opname_eenheid"])
+        if key not in cases:
+            cases[key] = {
+                "omschrijving": correction["opname_text"],
+                "eenheid": correction["opname_eenheid"],
+                "code": correction["chosen_code"],
+                "frequency": correction["frequency"],
+            }
+    return list(cases.values())
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """Parse 'name:KEY=value,KEY=value' into a name and config overrides"""
+    name, _, assignments = spec.partition(":")
+    overrides = {}
+    for assignment in filter(None, assignments.split(",")):
+        key, _, value = assignment.partition("=")
+        key = key.strip().upper()
+        if not hasattr(config, key):
+            raise ValueError(f"Unknown config setting: {key}")
+
+        current = getattr(config, key)
+        if isinstance(current, bool):
+            overrides[key] = value.strip().lower() == "true"
+        elif isinstance(current, (int, float)):
+            overrides[key] = type(current)(value)
+        else:
+            overrides[key] = value.strip()
+    return name or "config", overrides
+
+
+def _opname(cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parsed opname with one werkzaamheid per case"""
+    return {
+        "metadata": {},
+        "ruimtes": [{
+            "naam": "Evaluatie",
+            "werkzaamheden": [
+                {"omschrijving": case["omschrijving"], "hoeveelheid": 1, "eenheid": case["eenheid"]}
+                for case in cases
+            ]
+        }]
+    }
+
+
+def _ranked_codes(match: Dict[str, Any]) -> List[str]:
+    return [match["prijzenboek_match"]["code"]] + [alt["code"] for alt in match["alternatives"]]
+
+
+def evaluate_config(
+    name: str,
+    overrides: Dict[str, Any],
+    cases: List[Dict[str, Any]],
+    index: PrijzenboekIndex,
+    use_ai: bool = False
+) -> Dict[str, Any]:
+    """Accuracy and latency for one configuration (config is restored afterwards)"""
+    # Cached results would hide the latency of the configuration under test
+    overrides = {"MATCH_CACHE_ENABLED": False, **overrides}
+    previous = {key: getattr(config, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(config, key, value)
+
+    try:
+        # Whole opname in one call, as the API does (batch/parallel engines see all lines)
+        start = time.perf_counter()
+        matches = asyncio.run(match_werkzaamheden(_opname(cases), index, use_ai=use_ai, use_learning=False))
+        elapsed = time.perf_counter() - start
+
+        # Per-line latency, one line per call
+        latencies = []
+        for case in cases:
+            line_start = time.perf_counter()
+            asyncio.run(match_werkzaamheden(_opname([case]), index, use_ai=use_ai, use_learning=False))
+            latencies.append(time.perf_counter() - line_start)
+    finally:
+        for key, value in previous.items():
+            setattr(config, key, value)
+
+    by_line = {(m["opname_item"]["omschrijving"], m["opname_item"]["eenheid"]): m for m in matches}
+
+    top1 = top5 = 0
+    lines = []
+    for case in cases:
+        match = by_line.get((case["omschrijving"], case["eenheid"]))
+        ranked = _ranked_codes(match) if match else []
+        hit1 = bool(ranked) and ranked[0] == case["code"]
+        hit5 = case["code"] in ranked[:5]
+        top1 += hit1
+        top5 += hit5
+        lines.append({
+            "omschrijving": case["omschrijving"],
+            "eenheid": case["eenheid"],
+            "expected": case["code"],
+            "predicted": ranked[0] if ranked else None,
+            "top1": hit1,
+            "top5": hit5,
+        })
+
+    total = len(cases)
+    return {
+        "name": name,
+        "overrides": overrides,
+        "cases": total,
+        "top1_accuracy": round(top1 / total, 4) if total else 0.0,
+        "top5_accuracy": round(top5 / total, 4) if total else 0.0,
+        "lines_per_sec": round(total / elapsed, 2) if elapsed else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3) if latencies else 0.0,
+        "p95_ms": round(_p95(latencies) * 1000, 3) if latencies else 0.0,
+        "lines": lines,
+    }
+
+
+def _p95(values: List[float]) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[94]
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> Dict[str, Any]:
+    """Lines whose top-1 result flipped between two evaluations"""
+    regressions, improvements = [], []
+    for before, after in zip(baseline["lines"], candidate["lines"]):
+        if before["top1"] and not after["top1"]:
+            regressions.append(after)
+        elif after["top1"] and not before["top1"]:
+            improvements.append(after)
+    return {
+        "baseline": baseline["name"],
+        "candidate": candidate["name"],
+        "top1_delta": round(candidate["top1_accuracy"] - baseline["top1_accuracy"], 4),
+        "top5_delta": round(candidate["top5_accuracy"] - baseline["top5_accuracy"], 4),
+        "regressions": regressions,
+        "improvements": improvements,
+    }
+
+
+def print_report(results: List[Dict[str, Any]], comparison: Dict[str, Any] = None):
+    metrics = ["cases", "top1_accuracy", "top5_accuracy", "lines_per_sec", "p50_ms", "p95_ms"]
+    print(f"\n{'':<16}" + "".join(f"{r['name']:>16}" for r in results))
+    for metric in metrics:
+        print(f"{metric:<16}" + "".join(f"{str(r[metric]):>16}" for r in results))
+
+    if comparison:
+        print(f"\nTop-1 delta: {comparison['top1_delta']:+}  Top-5 delta: {comparison['top5_delta']:+}")
+        for line in comparison["regressions"]:
+            print(f"  REGRESSION  {line['omschrijving']} ({line['eenheid']}): expected {line['expected']}, got {line['predicted']}")
+        for line in comparison["improvements"]:
+            print(f"  improved    {line['omschrijving']} ({line['eenheid']}): {line['expected']}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate matcher accuracy against stored user corrections")
+    parser.add_argument(
+        "--config", action="append", default=[],
+        help="name:KEY=value,... config overrides (at most two; the first is the baseline)"
+    )
+    parser.add_argument("--corrections-db", default=str(BACKEND_DIR / "corrections.db"))
+    parser.add_argument("--prijzenboek-db", default=str(BACKEND_DIR / "prijzenboek.db"))
+    parser.add_argument("--use-ai", action="store_true", help="include AI re-ranking (costs API calls)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if the second config loses top-1 accuracy")
+    parser.add_argument("--output", help="JSON output file")
+    args = parser.parse_args(argv)
+
+    if len(args.config) > 2:
+        parser.error("at most two --config options can be compared")
+
+    cases = load_gold_labels(Path(args.corrections_db))
+    if not cases:
+        print("No corrections found, nothing to evaluate")
+        return 0
+
+    index = PrijzenboekIndex(load_prijzenboek(Path(args.prijzenboek_db)))
+    unknown = [case for case in cases if index.get_item_by_code(case["code"]) is None]
+    if unknown:
+        print(f"Skipping {len(unknown)} corrections whose code is not in the prijzenboek")
+        cases = [case for case in cases if index.get_item_by_code(case["code"]) is not None]
+
+    configs = [parse_config(spec) for spec in args.config] or [("current", {})]
+    results = [evaluate_config(name, overrides, cases, index, use_ai=args.use_ai) for name, overrides in configs]
+    comparison = compare(results[0], results[1]) if len(results) == 2 else None
+
+    print_report(results, comparison)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "comparison": comparison, "skipped_unknown_codes": len(unknown)}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.fail_on_regression and comparison and comparison["top1_delta"] < 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
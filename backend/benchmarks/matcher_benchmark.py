@@ -0,0 +1,280 @@
+"""
+Matcher benchmark
+Runs every matcher engine on a synthetic opname against scaled prijzenboeken
+and reports lines/sec, p50/p95 per-line latency, peak memory and how many
+full Levenshtein evaluations were avoided. Results are written as JSON.
+The batch and parallel engines score many lines per call, so their per-line
+latency is the time of a chunk or shard divided by its lines; full
+evaluations of the batch engine are null (it doesn't count them), and the
+parallel peak memory only covers the main process.
+
+Usage (from the backend directory):
+    python -m benchmarks --sizes 1000 10000 100000 --lines 200 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List, Dict, Any
+
+try:
+    from ..config import config
+    from ..matcher import PrijzenboekIndex, find_best_matches_with_info
+    from .synthetic import generate_opname, load_prijzenboek, scale_prijzenboek
+except ImportError:
+    from config import config
+    from matcher import PrijzenboekIndex, find_best_matches_with_info
+    from benchmarks.synthetic import generate_opname, load_prijzenboek, scale_prijzenboek
+
+
+ENGINES = ["standard", "batch", "parallel"]
+
+# Lines per batch-engine call when measuring per-line latency
+BATCH_LINES = 32
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+def _run_standard(lines: List[Dict[str, Any]], index: PrijzenboekIndex, top_n: int):
+    latencies = []
+    infos = []
+    for werkzaamheid in lines:
+        start = time.perf_counter()
+        _, info = find_best_matches_with_info(werkzaamheid, index, top_n=top_n, use_cache=False)
+        latencies.append(time.perf_counter() - start)
+        infos.append(info)
+    return sum(latencies), latencies, infos
+
+
+def _run_batch(lines: List[Dict[str, Any]], index: PrijzenboekIndex, top_n: int):
+    try:
+        from ..batch_matcher import find_best_matches_batch_with_info
+    except ImportError:
+        from batch_matcher import find_best_matches_batch_with_info
+
+    elapsed = 0.0
+    latencies = []
+    infos = []
+    for start_line in range(0, len(lines), BATCH_LINES):
+        chunk = lines[start_line:start_line + BATCH_LINES]
+        start = time.perf_counter()
+        results = find_best_matches_batch_with_info(chunk, index, top_n=top_n)
+        chunk_elapsed = time.perf_counter() - start
+        elapsed += chunk_elapsed
+        # Lines are scored per chunk: per-line latency is the chunk time per line
+        latencies.extend([chunk_elapsed / len(chunk)] * len(chunk))
+        infos.extend(info for _, info in results)
+    return elapsed, latencies, infos
+
+
+def _run_parallel(lines: List[Dict[str, Any]], index: PrijzenboekIndex, top_n: int):
+    try:
+        from ..parallel_matcher import find_best_matches_parallel, get_pool, shutdown_pool, _match_shard
+    except ImportError:
+        from parallel_matcher import find_best_matches_parallel, get_pool, shutdown_pool, _match_shard
+
+    async def run():
+        # Warm up: start the workers (and ship the index) outside the measurement
+        await find_best_matches_parallel(lines[:config.MATCHER_WORKERS], index, top_n=top_n)
+
+        # Same sharding as find_best_matches_parallel, timing every shard
+        loop = asyncio.get_running_loop()
+        shard_size = math.ceil(len(lines) / config.MATCHER_WORKERS)
+        shards = [lines[i:i + shard_size] for i in range(0, len(lines), shard_size)]
+        start = time.perf_counter()
+
+        async def run_shard(shard):
+            results = await loop.run_in_executor(pool, _match_shard, shard, top_n, "standard")
+            return time.perf_counter() - start, results
+
+        shard_results = await asyncio.gather(*[run_shard(shard) for shard in shards])
+        return time.perf_counter() - start, shards, shard_results
+
+    pool = get_pool(index)
+    try:
+        elapsed, shards, shard_results = asyncio.run(run())
+    finally:
+        shutdown_pool()
+
+    # Per-line latency is the shard time per line
+    latencies = []
+    infos = []
+    for shard, (shard_elapsed, results) in zip(shards, shard_results):
+        latencies.extend([shard_elapsed / len(shard)] * len(shard))
+        infos.extend(info for _, info in results)
+    return elapsed, latencies, infos
+
+
+# What a per-line latency is derived from
+LATENCY_UNITS = {
+    "standard": "line",
+    "batch": "chunk",
+    "parallel": "shard",
+}
+
+RUNNERS = {
+    "standard": _run_standard,
+    "batch": _run_batch,
+    "parallel": _run_parallel,
+}
+
+
+def benchmark_engine(
+    engine: str,
+    lines: List[Dict[str, Any]],
+    index: PrijzenboekIndex,
+    top_n: int = 10,
+    measure_memory: bool = True
+) -> Dict[str, Any]:
+    """
+    Benchmark one engine; memory is measured in a separate run so tracing doesn't skew latency
+    Throughput uses the time the runner measured for scoring (without pool start-up and shutdown)
+    """
+    runner = RUNNERS[engine]
+
+    elapsed, latencies, infos = runner(lines, index, top_n)
+
+    peak_memory_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        runner(lines, index, top_n)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_memory_mb = round(peak / (1024 * 1024), 2)
+
+    items_scored = sum(info["items_scored"] for info in infos)
+    # The batch engine computes Levenshtein for every item and doesn't count evaluations
+    if all("full_evaluations" in info for info in infos):
+        full_evaluations = sum(info["full_evaluations"] for info in infos)
+        evaluations_avoided = (len(lines) * len(index)) - full_evaluations
+    else:
+        full_evaluations = evaluations_avoided = None
+
+    return {
+        "engine": engine,
+        "lines": len(lines),
+        "seconds": round(elapsed, 4),
+        "lines_per_sec": round(len(lines) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "latency_per": LATENCY_UNITS[engine],
+        "peak_memory_mb": peak_memory_mb,
+        # tracemalloc only sees this process, not the pool workers
+        "peak_memory_scope": "main process only" if engine == "parallel" else "process",
+        "items_scored": items_scored,
+        "full_evaluations": full_evaluations,
+        "evaluations_avoided": evaluations_avoided,
+        "unit_fallbacks": sum(1 for info in infos if info["unit_fallback"]),
+    }
+
+
+def run_benchmark(
+    sizes: List[int],
+    engines: List[str],
+    n_lines: int = 200,
+    top_n: int = 10,
+    seed: int = 42,
+    measure_memory: bool = True
+) -> Dict[str, Any]:
+    """Run all engines for all prijzenboek sizes"""
+    base_items = load_prijzenboek()
+    opname = generate_opname(n_lines, seed=seed)
+    lines = [w for ruimte in opname["ruimtes"] for w in ruimte["werkzaamheden"]]
+
+    results = []
+    for size in sizes:
+        items = scale_prijzenboek(base_items, size, seed=seed)
+
+        start = time.perf_counter()
+        index = PrijzenboekIndex(items)
+        index_build_s = round(time.perf_counter() - start, 4)
+        print(f"Prijzenboek {size} rows: index built in {index_build_s}s")
+
+        for engine in engines:
+            result = benchmark_engine(engine, lines, index, top_n=top_n, measure_memory=measure_memory)
+            result.update({"prijzenboek_size": size, "index_build_s": index_build_s})
+            results.append(result)
+            print(
+                f"  {engine:<9} {result['lines_per_sec']!s:>9} lines/s  "
+                f"p50 {result['p50_ms']!s:>8} ms  p95 {result['p95_ms']!s:>8} ms  "
+                f"peak {result['peak_memory_mb']} MB  avoided {result['evaluations_avoided']}"
+            )
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "lines": n_lines,
+            "top_n": top_n,
+            "seed": seed,
+            "matcher_workers": config.MATCHER_WORKERS,
+            "candidate_pruning_enabled": config.CANDIDATE_PRUNING_ENABLED,
+            "unit_partitioning_enabled": config.UNIT_PARTITIONING_ENABLED,
+        },
+        "results": results,
+    }
+
+
+def _available_engines(engines: List[str]) -> List[str]:
+    try:
+        from ..batch_matcher import BATCH_ENGINE_AVAILABLE
+    except ImportError:
+        from batch_matcher import BATCH_ENGINE_AVAILABLE
+
+    available = []
+    for engine in engines:
+        if engine == "batch" and not BATCH_ENGINE_AVAILABLE:
+            print("Skipping batch engine (numpy/rapidfuzz missing)")
+        elif engine == "parallel" and config.MATCHER_WORKERS < 2:
+            print("Skipping parallel engine (set --workers or MATCHER_WORKERS to 2 or more)")
+        else:
+            available.append(engine)
+    return available
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the matcher engines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="prijzenboek sizes (rows)")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--lines", type=int, default=200, help="opname lines per run")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size for the parallel engine")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON output file")
+    args = parser.parse_args(argv)
+
+    if args.workers is not None:
+        config.MATCHER_WORKERS = args.workers
+    elif config.MATCHER_WORKERS < 2:
+        config.MATCHER_WORKERS = os.cpu_count() or 1
+
+    report = run_benchmark(
+        sizes=args.sizes,
+        engines=_available_engines(args.engines),
+        n_lines=args.lines,
+        top_n=args.top_n,
+        seed=args.seed,
+        measure_memory=not args.no_memory,
+    )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
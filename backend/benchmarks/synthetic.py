@@ -0,0 +1,153 @@
+"""
+Synthetic benchmark data
+Builds opnames from CONSTRUCTION_SYNONYMS vocabulary plus real opname lines,
+and scales the prijzenboek from prijzenboek.db to any number of rows
+"""
+import random
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+try:
+    from ..matcher import CONSTRUCTION_SYNONYMS
+    from ..document_parser import extract_quantity_and_unit, parse_docx_opname
+    from ..database import PrijzenboekDB
+except ImportError:
+    from matcher import CONSTRUCTION_SYNONYMS
+    from document_parser import extract_quantity_and_unit, parse_docx_opname
+    from database import PrijzenboekDB
+
+
+BACKEND_DIR = Path(__file__).parent.parent
+EXAMPLE_OPNAME = BACKEND_DIR.parent / "Voorofscheweg_218_251107_094114.docx"
+
+ACTIONS = ['verwijderen', 'vervangen', 'schilderen', 'aanbrengen', 'herstellen', 'egaliseren', 'stucen', 'sausen']
+OBJECTS = [key for key in CONSTRUCTION_SYNONYMS if key not in ACTIONS]
+
+ROOMS = [
+    'Woonkamer', 'Keuken', 'Badkamer', 'Toilet', 'Hal', 'Overloop boven',
+    'Slaapkamer boven voor', 'Slaapkamer boven achter', 'Zolder', 'Berging'
+]
+
+# Lines that come back in almost every room
+STANDARD_LINES = ['plinten verwijderen', 'wanden sausen', 'plafond sausen', 'radiator schilderen']
+
+# Variants appended when the prijzenboek is scaled up
+QUALIFIERS = [
+    'type {n}', 'incl. afvoer', 'excl. materiaal', 'klein', 'groot', 'hoogte tot 3m',
+    'incl. voorbehandeling', 'variant {n}', 'per zijde', 'compleet'
+]
+
+
+def load_real_lines(docx_path: Path = EXAMPLE_OPNAME) -> List[str]:
+    """Raw opname lines from the example opname (empty if it is missing)"""
+    if not Path(docx_path).exists():
+        return []
+    opname = parse_docx_opname(str(docx_path))
+    return [w["raw_text"] for ruimte in opname["ruimtes"] for w in ruimte["werkzaamheden"]]
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    """Swap two neighbouring letters, like a quick phone note"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def synthetic_line(rng: random.Random, typo_rate: float = 0.05) -> str:
+    """One opname line built from synonym vocabulary, with a quantity in one of the usual notations"""
+    action = rng.choice(CONSTRUCTION_SYNONYMS[rng.choice(ACTIONS)])
+    obj = rng.choice(CONSTRUCTION_SYNONYMS[rng.choice(OBJECTS)])
+    words = [_typo(w, rng) if rng.random() < typo_rate else w for w in f"{obj} {action}".split()]
+    description = " ".join(words)
+
+    notation = rng.randrange(4)
+    if notation == 0:
+        qty = str(round(rng.uniform(1, 40), 1)).replace('.', ',')
+        return f"{qty}{rng.choice(['m2', 'm1'])} {description}"
+    if notation == 1:
+        return f"{rng.randint(1, 6)}x {description}"
+    if notation == 2:
+        return f"{description} {rng.randint(1, 30)}m1"
+    return description.capitalize()
+
+
+def generate_opname(
+    n_lines: int,
+    seed: int = 42,
+    real_lines: Optional[List[str]] = None,
+    real_fraction: float = 0.4,
+    standard_fraction: float = 0.15
+) -> Dict[str, Any]:
+    """
+    Generate a parsed opname (same structure as parse_docx_opname) with n_lines werkzaamheden
+    Mixes real lines, standard lines repeated across rooms and synthetic lines
+    """
+    rng = random.Random(seed)
+    real_lines = real_lines if real_lines is not None else load_real_lines()
+
+    lines_per_room = max(1, n_lines // len(ROOMS))
+    ruimtes = []
+    for n in range(n_lines):
+        if n % lines_per_room == 0:
+            ruimtes.append({"naam": ROOMS[len(ruimtes) % len(ROOMS)], "werkzaamheden": []})
+
+        roll = rng.random()
+        if real_lines and roll < real_fraction:
+            text = rng.choice(real_lines)
+        elif roll < real_fraction + standard_fraction:
+            text = rng.choice(STANDARD_LINES)
+        else:
+            text = synthetic_line(rng)
+
+        qty, unit, description = extract_quantity_and_unit(text)
+        ruimtes[-1]["werkzaamheden"].append({
+            "omschrijving": description,
+            "hoeveelheid": qty,
+            "eenheid": unit,
+            "raw_text": text
+        })
+
+    return {
+        "metadata": {"datum": None, "adres": "Benchmark", "opzichter": None},
+        "ruimtes": ruimtes
+    }
+
+
+def load_prijzenboek(db_path: Path = BACKEND_DIR / "prijzenboek.db") -> List[Dict[str, Any]]:
+    """Prijzenboek items from the SQLite database"""
+    return PrijzenboekDB(str(db_path)).get_all_items()
+
+
+def _variant(omschrijving: str, n: int, rng: random.Random) -> str:
+    """Plausible variant of a prijzenboek omschrijving: swapped synonym and/or qualifier"""
+    words = omschrijving.split()
+    for i, word in enumerate(words):
+        for synonyms in CONSTRUCTION_SYNONYMS.values():
+            if word.lower() in synonyms and rng.random() < 0.5:
+                words[i] = rng.choice(synonyms)
+                break
+    qualifier = rng.choice(QUALIFIERS).format(n=n)
+    return " ".join(words) + " " + qualifier
+
+
+def scale_prijzenboek(items: List[Dict[str, Any]], size: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Prijzenboek with exactly `size` rows: a prefix of items, or items plus generated variants"""
+    if size <= len(items):
+        return [dict(item) for item in items[:size]]
+
+    rng = random.Random(seed)
+    scaled = [dict(item) for item in items]
+    n = 1
+    while len(scaled) < size:
+        for item in items:
+            if len(scaled) >= size:
+                break
+            variant = dict(item)
+            variant["code"] = f"{item['code']}-{n}"
+            variant["omschrijving"] = _variant(item["omschrijving"], n, rng)
+            variant["omschrijving_offerte"] = variant["omschrijving"]
+            scaled.append(variant)
+        n += 1
+
+    return scaled
@@ -26,10 +26,21 @@ class Config:
     AI_CONFIDENCE_THRESHOLD: float = float(os.getenv("AI_CONFIDENCE_THRESHOLD", "0.7"))
     MAX_CANDIDATES_FOR_AI: int = int(os.getenv("MAX_CANDIDATES_FOR_AI", "10"))
     AI_TIMEOUT_SECONDS: int = int(os.getenv("AI_TIMEOUT_SECONDS", "30"))
+    AI_MAX_CONCURRENCY: int = int(os.getenv("AI_MAX_CONCURRENCY", "5"))
+    AI_BATCH_SIZE: int = int(os.getenv("AI_BATCH_SIZE", "5"))
 
     # Caching Settings
     CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
     CACHE_TTL_HOURS: int = int(os.getenv("CACHE_TTL_HOURS", "24"))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+    AI_CACHE_MAX_BYTES: int = int(os.getenv("AI_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    AI_CACHE_PERSIST: bool = os.getenv("AI_CACHE_PERSIST", "true").lower() == "true"
+    AI_CACHE_PURGE_INTERVAL_MINUTES: int = int(os.getenv("AI_CACHE_PURGE_INTERVAL_MINUTES", "60"))
+
+    # Match Result Cache (fuzzy candidates per prijzenboek version)
+    MATCH_CACHE_ENABLED: bool = os.getenv("MATCH_CACHE_ENABLED", "true").lower() == "true"
+    MATCH_CACHE_MAX_ENTRIES: int = int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "10000"))
+    MATCH_CACHE_PERSIST: bool = os.getenv("MATCH_CACHE_PERSIST", "false").lower() == "true"
 
     # Learning Settings
     LEARNING_ENABLED: bool = os.getenv("LEARNING_ENABLED", "true").lower() == "true"
@@ -39,6 +50,43 @@ class Config:
     TEXT_SCORE_WEIGHT: float = float(os.getenv("TEXT_SCORE_WEIGHT", "0.7"))
     UNIT_SCORE_WEIGHT: float = float(os.getenv("UNIT_SCORE_WEIGHT", "0.3"))
 
+    # Text Scorer: "fuzzy" (Levenshtein + keyword blend) or "bm25" (synonym-expanded keywords)
+    TEXT_SCORER: str = os.getenv("TEXT_SCORER", "fuzzy").lower()
+    BM25_K1: float = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+
+    # Spelling Correction (opname words corrected against the prijzenboek vocabulary before scoring)
+    SPELLING_CORRECTION_ENABLED: bool = os.getenv("SPELLING_CORRECTION_ENABLED", "false").lower() == "true"
+    SPELLING_MAX_EDIT_DISTANCE: int = int(os.getenv("SPELLING_MAX_EDIT_DISTANCE", "2"))
+
+    # Vector Engine (hashed word + character n-gram TF-IDF, needs numpy)
+    VECTOR_ENGINE_ENABLED: bool = os.getenv("VECTOR_ENGINE_ENABLED", "false").lower() == "true"
+    VECTOR_DIMENSIONS: int = int(os.getenv("VECTOR_DIMENSIONS", "2048"))
+    VECTOR_CANDIDATES: int = int(os.getenv("VECTOR_CANDIDATES", "100"))
+
+    # Matcher Engine: "standard" (per line) or "batch" (all lines at once, needs numpy + rapidfuzz)
+    MATCHER_ENGINE: str = os.getenv("MATCHER_ENGINE", "standard").lower()
+
+    # Parallel Matching (process pool, keeps CPU-bound matching of large opnames
+    # off the event loop; unset = CPU count - 1, 0 = match in-process)
+    MATCHER_WORKERS: int = int(os.getenv("MATCHER_WORKERS") or max(1, (os.cpu_count() or 2) - 1))
+    PARALLEL_MIN_LINES: int = int(os.getenv("PARALLEL_MIN_LINES", "100"))
+
+    # Unit Partitioning (search unit-compatible items first)
+    UNIT_PARTITIONING_ENABLED: bool = os.getenv("UNIT_PARTITIONING_ENABLED", "true").lower() == "true"
+    UNIT_FALLBACK_SCORE: float = float(os.getenv("UNIT_FALLBACK_SCORE", "0.7"))
+
+    # Candidate Pruning (only score items sharing a keyword with the opname line)
+    CANDIDATE_PRUNING_ENABLED: bool = os.getenv("CANDIDATE_PRUNING_ENABLED", "true").lower() == "true"
+    PRUNING_MIN_QUERY_LENGTH: int = int(os.getenv("PRUNING_MIN_QUERY_LENGTH", "4"))
+    PRUNING_FALLBACK_SCORE: float = float(os.getenv("PRUNING_FALLBACK_SCORE", "0.7"))
+    # Candidate retrieval: "tokens" (keyword index), "trigram" (character trigrams, typo tolerant) or "hybrid" (both)
+    CANDIDATE_RETRIEVAL: str = os.getenv("CANDIDATE_RETRIEVAL", "hybrid").lower()
+    TRIGRAM_CANDIDATES: int = int(os.getenv("TRIGRAM_CANDIDATES", "300"))
+
+    # Progress Events (WebSocket per session, at most one event per stage per interval)
+    PROGRESS_INTERVAL_SECONDS: float = float(os.getenv("PROGRESS_INTERVAL_SECONDS", "0.25"))
+
     @classmethod
     def is_ai_available(cls) -> bool:
         """Check if AI matching is available and configured"""
@@ -53,11 +101,24 @@ class Config:
             "ai_model": cls.AI_MODEL,
             "ai_confidence_threshold": cls.AI_CONFIDENCE_THRESHOLD,
             "max_candidates_for_ai": cls.MAX_CANDIDATES_FOR_AI,
+            "ai_max_concurrency": cls.AI_MAX_CONCURRENCY,
+            "ai_batch_size": cls.AI_BATCH_SIZE,
             "cache_enabled": cls.CACHE_ENABLED,
             "cache_ttl_hours": cls.CACHE_TTL_HOURS,
+            "ai_cache_max_entries": cls.AI_CACHE_MAX_ENTRIES,
+            "ai_cache_persist": cls.AI_CACHE_PERSIST,
+            "match_cache_enabled": cls.MATCH_CACHE_ENABLED,
             "learning_enabled": cls.LEARNING_ENABLED,
             "text_score_weight": cls.TEXT_SCORE_WEIGHT,
             "unit_score_weight": cls.UNIT_SCORE_WEIGHT,
+            "text_scorer": cls.TEXT_SCORER,
+            "spelling_correction_enabled": cls.SPELLING_CORRECTION_ENABLED,
+            "vector_engine_enabled": cls.VECTOR_ENGINE_ENABLED,
+            "matcher_engine": cls.MATCHER_ENGINE,
+            "matcher_workers": cls.MATCHER_WORKERS,
+            "unit_partitioning_enabled": cls.UNIT_PARTITIONING_ENABLED,
+            "candidate_pruning_enabled": cls.CANDIDATE_PRUNING_ENABLED,
+            "candidate_retrieval": cls.CANDIDATE_RETRIEVAL,
         }
 
 
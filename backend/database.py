@@ -8,6 +8,24 @@ from pathlib import Path
 import json
 
 
+# Callbacks run after every write (e.g. to invalidate cached match results)
+_change_listeners = []
+
+
+def add_change_listener(listener):
+    """Register a callback that is called after the prijzenboek database changes"""
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def _notify_change():
+    for listener in _change_listeners:
+        try:
+            listener()
+        except Exception as e:
+            print(f"Prijzenboek change listener failed: {e}")
+
+
 class PrijzenboekDB:
     def __init__(self, db_path: str = None):
         if db_path is None:
@@ -107,8 +125,8 @@ class PrijzenboekDB:
             return item
         return None
 
-    def add_item(self, item: Dict[str, Any]) -> bool:
-        """Add new item to database"""
+    def add_item(self, item: Dict[str, Any], notify: bool = True) -> bool:
+        """Add new item to database (notify=False leaves notifying listeners to the caller)"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
@@ -148,13 +166,15 @@ class PrijzenboekDB:
             ))
             conn.commit()
             conn.close()
+            if notify:
+                _notify_change()
             return True
         except sqlite3.IntegrityError:
             conn.close()
             return False
 
-    def update_item(self, code: str, item: Dict[str, Any]) -> bool:
-        """Update existing item"""
+    def update_item(self, code: str, item: Dict[str, Any], notify: bool = True) -> bool:
+        """Update existing item (notify=False leaves notifying listeners to the caller)"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
@@ -213,16 +233,18 @@ class PrijzenboekDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        if success and notify:
+            _notify_change()
         return success
 
-    def upsert_item(self, item: Dict[str, Any]) -> str:
+    def upsert_item(self, item: Dict[str, Any], notify: bool = True) -> str:
         """Insert or update item based on code"""
         code = item.get('code', '')
         if self.get_item_by_code(code):
-            self.update_item(code, item)
+            self.update_item(code, item, notify=notify)
             return 'updated'
         else:
-            self.add_item(item)
+            self.add_item(item, notify=notify)
             return 'added'
 
     def delete_item(self, code: str) -> bool:
@@ -237,6 +259,8 @@ class PrijzenboekDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        if success:
+            _notify_change()
         return success
 
     def bulk_upsert(self, items: List[Dict[str, Any]]) -> Dict[str, int]:
@@ -245,12 +269,16 @@ class PrijzenboekDB:
         updated = 0
 
         for item in items:
-            result = self.upsert_item(item)
+            result = self.upsert_item(item, notify=False)
             if result == 'added':
                 added += 1
             else:
                 updated += 1
 
+        # Invalidate cached match results once for the whole import
+        if items:
+            _notify_change()
+
         return {'added': added, 'updated': updated}
 
     def clear_all(self):
@@ -260,6 +288,7 @@ class PrijzenboekDB:
         cursor.execute('DELETE FROM prijzenboek')
         conn.commit()
         conn.close()
+        _notify_change()
 
     def count_items(self) -> int:
         """Get total number of items"""
@@ -5,7 +5,7 @@ Uses Book1.xlsx template and preserves all styling, merged cells, and formatting
 import openpyxl
 from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 from pathlib import Path
 from datetime import datetime
 from copy import copy
@@ -14,7 +14,8 @@ from copy import copy
 def generate_filled_excel(
     template_path: str,
     matches: List[Dict[str, Any]],
-    session_dir: Path
+    session_dir: Path,
+    progress: Optional[Callable[..., Any]] = None
 ) -> str:
     """
     Generate filled Excel file using Woonforte offerte template
@@ -24,6 +25,7 @@ def generate_filled_excel(
         template_path: Path to template (not used, we use our own template)
         matches: List of matched werkzaamheden
         session_dir: Session directory for output
+        progress: Optional callback (rows written, total rows), e.g. a progress.ProgressReporter
 
     Returns:
         Path to generated Excel file
@@ -60,6 +62,7 @@ def generate_filled_excel(
 
     # Start inserting at row 17 (after headers at row 16)
     insert_position = 17
+    rows_written = 0
 
     # Define orange fill for ruimte headers (like in template)
     orange_fill = PatternFill(start_color="FF6B35", end_color="FF6B35", fill_type="solid")
@@ -127,6 +130,9 @@ def generate_filled_excel(
                 ws.cell(row=insert_position, column=col).number_format = '€#,##0.00'
 
             insert_position += 1
+            rows_written += 1
+            if progress:
+                progress(rows_written, len(matches))
 
         # Add blank line between ruimtes
         ws.insert_rows(insert_position)
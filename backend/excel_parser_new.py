@@ -3,10 +3,10 @@ Excel prijzenboek parser voor nieuwe structuur
 Met ruimte kolommen (C-O) en prijzen in kolommen R-Y
 """
 import openpyxl
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 
 
-def parse_prijzenboek_new(file_path: str) -> List[Dict[str, Any]]:
+def parse_prijzenboek_new(file_path: str, progress: Optional[Callable[..., Any]] = None) -> List[Dict[str, Any]]:
     """
     Parse de nieuwe prijzenboek structuur
     Ondersteunt twee formaten:
@@ -14,6 +14,9 @@ def parse_prijzenboek_new(file_path: str) -> List[Dict[str, Any]]:
     2. Simpel formaat: CODERING | OMSCHRIJVING | (lege kolommen) | EENHEID | Materiaal | Uren | Prijs | OMSCHRIJVING OFFERTE
 
     De parser detecteert automatisch welk formaat wordt gebruikt door de headers te lezen.
+
+    progress wordt per gelezen rij aangeroepen met (rijen gelezen, totaal aantal rijen),
+    bijvoorbeeld een progress.ProgressReporter
     """
     wb = openpyxl.load_workbook(file_path, data_only=True, read_only=True)
     sheet = wb.active
@@ -57,10 +60,13 @@ def parse_prijzenboek_new(file_path: str) -> List[Dict[str, Any]]:
     is_simple_format = "EENHEID" in header_map and header_map["EENHEID"] < 10
 
     row_num = 1  # Will be incremented to 2 at first iteration
+    total_rows = sheet.max_row - 1 if sheet.max_row else None
 
     # Use iter_rows for much better performance with read_only mode
     for row in sheet.iter_rows(min_row=2, max_col=25, values_only=True):
         row_num += 1  # Increment at start (2, 3, 4, ...)
+        if progress:
+            progress(row_num - 1, total_rows)
 
         # Get values from tuple - Basis informatie
         code = row[0] if len(row) > 0 else None  # A
@@ -178,6 +184,8 @@ def parse_prijzenboek_new(file_path: str) -> List[Dict[str, Any]]:
         prijzenboek.append(item)
 
     wb.close()
+    if progress and row_num - 1 != total_rows:
+        progress(row_num - 1, row_num - 1)
     return prijzenboek
 
 
@@ -1,13 +1,16 @@
 """
 FastAPI backend for Offerte Generator MVP
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 import sys
+import json
+import asyncio
 import shutil
 from pathlib import Path
 import uuid
@@ -20,14 +23,22 @@ try:
     # Try relative imports first (when running as package)
     from .document_parser import parse_docx_opname
     from .excel_parser import parse_prijzenboek
-    from .matcher import match_werkzaamheden
+    from .matcher import match_werkzaamheden, iter_match_werkzaamheden, refine_pending_matches, get_prijzenboek_index, prepare_prijzenboek_index
     from .excel_generator import generate_filled_excel
+    from .progress import ProgressReporter, get_progress_hub
+    from .metrics import collect_metrics, get_metrics_registry
+    from .ai_cache import get_ai_cache
+    from .config import config
 except ImportError:
     # Fall back to absolute imports (when running directly)
     from document_parser import parse_docx_opname
     from excel_parser import parse_prijzenboek
-    from matcher import match_werkzaamheden
+    from matcher import match_werkzaamheden, iter_match_werkzaamheden, refine_pending_matches, get_prijzenboek_index, prepare_prijzenboek_index
     from excel_generator import generate_filled_excel
+    from progress import ProgressReporter, get_progress_hub
+    from metrics import collect_metrics, get_metrics_registry
+    from ai_cache import get_ai_cache
+    from config import config
 
 app = FastAPI(title="Offerte Generator API", version="1.0.0")
 
@@ -52,6 +63,9 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 # In-memory storage for sessions (in production, use Redis or DB)
 sessions = {}
 
+# Background task removing expired AI cache entries
+_ai_cache_purge_task = None
+
 
 class MatchReview(BaseModel):
     """Model for match review data"""
@@ -71,6 +85,63 @@ class TextUploadRequest(BaseModel):
     text: str
 
 
+async def _purge_ai_cache_periodically():
+    """Remove expired AI cache entries now and every AI_CACHE_PURGE_INTERVAL_MINUTES"""
+    while True:
+        try:
+            removed = await run_in_threadpool(get_ai_cache().purge_expired)
+            if removed:
+                print(f"Purged {removed} expired AI cache entries")
+        except Exception as e:
+            print(f"Error purging AI cache: {e}")
+        await asyncio.sleep(config.AI_CACHE_PURGE_INTERVAL_MINUTES * 60)
+
+
+@app.on_event("startup")
+async def start_ai_cache_purge():
+    """Start purging expired AI cache entries in the background"""
+    global _ai_cache_purge_task
+    if config.CACHE_ENABLED:
+        _ai_cache_purge_task = asyncio.create_task(_purge_ai_cache_periodically())
+
+
+@app.on_event("shutdown")
+async def stop_ai_cache_purge():
+    """Stop the AI cache purge task"""
+    if _ai_cache_purge_task is not None:
+        _ai_cache_purge_task.cancel()
+
+
+@app.on_event("shutdown")
+async def shutdown_matcher_pool():
+    """Stop parallel matching workers"""
+    try:
+        from .parallel_matcher import shutdown_pool
+    except ImportError:
+        from parallel_matcher import shutdown_pool
+    shutdown_pool()
+
+
+@app.on_event("shutdown")
+async def shutdown_ai_client():
+    """Close the shared Claude client"""
+    try:
+        from .ai_matcher import close_ai_client
+    except ImportError:
+        try:
+            from ai_matcher import close_ai_client
+        except ImportError:
+            return
+    await close_ai_client()
+
+
+def _get_session_index(session: Dict[str, Any]):
+    """Get the session's PrijzenboekIndex, building it if needed"""
+    if not session.get("prijzenboek_index"):
+        session["prijzenboek_index"] = get_prijzenboek_index(session["prijzenboek_data"])
+    return session["prijzenboek_index"]
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -101,6 +172,7 @@ async def upload_notes(file: UploadFile = File(...)):
             "prijzenboek_path": None,
             "parsed_opname": None,
             "prijzenboek_data": None,
+            "prijzenboek_index": None,
             "matches": None
         }
 
@@ -138,6 +210,7 @@ async def upload_notes_text(request: TextUploadRequest):
             "prijzenboek_path": None,
             "parsed_opname": None,
             "prijzenboek_data": None,
+            "prijzenboek_index": None,
             "matches": None
         }
 
@@ -215,9 +288,18 @@ async def process_parse(session_id: str):
         except ImportError:
             from excel_parser_new import parse_prijzenboek_new
 
-        prijzenboek_data = parse_prijzenboek_new(session["prijzenboek_path"])
+        # In a worker thread, so progress events reach the WebSocket meanwhile
+        prijzenboek_data = await run_in_threadpool(
+            parse_prijzenboek_new,
+            session["prijzenboek_path"],
+            progress=ProgressReporter(session_id, "parse_prijzenboek")
+        )
         session["prijzenboek_data"] = prijzenboek_data
 
+        # Precompile for matching (reused across sessions with the same prijzenboek)
+        session["prijzenboek_index"] = get_prijzenboek_index(prijzenboek_data)
+        await run_in_threadpool(prepare_prijzenboek_index, session["prijzenboek_index"])
+
         # Count werkzaamheden
         total_werkzaamheden = sum(
             len(ruimte["werkzaamheden"])
@@ -237,8 +319,13 @@ async def process_parse(session_id: str):
 
 
 @app.post("/api/process/match")
-async def process_match(session_id: str):
-    """Match werkzaamheden with prijzenboek"""
+async def process_match(session_id: str, time_budget: Optional[float] = None, debug: bool = False):
+    """
+    Match werkzaamheden with prijzenboek
+    With time_budget (seconds) the best results so far are returned when it
+    runs out; unfinished lines have status "pending" (see /api/process/match/refine)
+    With debug the response includes per-stage metrics of this request
+    """
     try:
         # Validate session
         if session_id not in sessions:
@@ -250,26 +337,27 @@ async def process_match(session_id: str):
             raise HTTPException(status_code=400, detail="Documents not parsed yet")
 
         # Perform matching
-        matches = await match_werkzaamheden(
-            session["parsed_opname"],
-            session["prijzenboek_data"]
-        )
+        match_stats = {}
+        with collect_metrics() as request_metrics:
+            matches = await match_werkzaamheden(
+                session["parsed_opname"],
+                _get_session_index(session),
+                stats=match_stats,
+                time_budget=time_budget,
+                progress=ProgressReporter(session_id, "match")
+            )
 
         session["matches"] = matches
 
-        # Calculate statistics
-        high_confidence = sum(1 for m in matches if m["confidence"] >= 0.9)
-        medium_confidence = sum(1 for m in matches if 0.7 <= m["confidence"] < 0.9)
-        low_confidence = sum(1 for m in matches if m["confidence"] < 0.7)
-
-        return {
+        response = {
             "session_id": session_id,
-            "total_matches": len(matches),
-            "high_confidence": high_confidence,
-            "medium_confidence": medium_confidence,
-            "low_confidence": low_confidence,
+            **_match_summary(matches),
+            "stats": match_stats,
             "matches": matches
         }
+        if debug:
+            response["metrics"] = request_metrics.snapshot()
+        return response
 
     except Exception as e:
         import traceback
@@ -277,6 +365,117 @@ async def process_match(session_id: str):
         raise HTTPException(status_code=500, detail=error_detail)
 
 
+@app.post("/api/process/match/stream")
+async def process_match_stream(
+    session_id: str,
+    format: str = "ndjson",
+    time_budget: Optional[float] = None,
+    debug: bool = False
+):
+    """
+    Match werkzaamheden with prijzenboek, streaming every match as soon as it is known
+    Events (NDJSON lines, or SSE with format=sse): {"type": "match", "match": ...}
+    per line in opname order, then {"type": "summary", ...} with the same counts
+    as /api/process/match (or {"type": "error", "detail": ...})
+    """
+    # Validate session
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    session = sessions[session_id]
+
+    if not session["parsed_opname"] or not session["prijzenboek_data"]:
+        raise HTTPException(status_code=400, detail="Documents not parsed yet")
+
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+
+    def event(data: Dict[str, Any]) -> str:
+        payload = json.dumps(data, default=str)
+        if format == "sse":
+            return f"event: {data['type']}\ndata: {payload}\n\n"
+        return payload + "\n"
+
+    async def events():
+        matches = []
+        match_stats = {}
+        with collect_metrics() as request_metrics:
+            try:
+                async for match in iter_match_werkzaamheden(
+                    session["parsed_opname"],
+                    _get_session_index(session),
+                    stats=match_stats,
+                    time_budget=time_budget,
+                    progress=ProgressReporter(session_id, "match")
+                ):
+                    matches.append(match)
+                    yield event({"type": "match", "match": match})
+            except Exception as e:
+                yield event({"type": "error", "detail": str(e)})
+                return
+
+        session["matches"] = matches
+
+        summary = {"type": "summary", "session_id": session_id, **_match_summary(matches), "stats": match_stats}
+        if debug:
+            summary["metrics"] = request_metrics.snapshot()
+        yield event(summary)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/api/process/match/refine")
+async def process_match_refine(session_id: str, time_budget: Optional[float] = None, debug: bool = False):
+    """Refine the pending matches of a session (left by a time-budgeted match)"""
+    try:
+        # Validate session
+        if session_id not in sessions:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        session = sessions[session_id]
+
+        if not session["matches"]:
+            raise HTTPException(status_code=400, detail="No matches found")
+
+        match_stats = {}
+        with collect_metrics() as request_metrics:
+            refined = await refine_pending_matches(
+                session["matches"],
+                _get_session_index(session),
+                stats=match_stats,
+                time_budget=time_budget,
+                progress=ProgressReporter(session_id, "match")
+            )
+
+        response = {
+            "session_id": session_id,
+            "refined": refined,
+            **_match_summary(session["matches"]),
+            "stats": match_stats,
+            "matches": session["matches"]
+        }
+        if debug:
+            response["metrics"] = request_metrics.snapshot()
+        return response
+
+    except Exception as e:
+        import traceback
+        error_detail = f"{str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+        raise HTTPException(status_code=500, detail=error_detail)
+
+
+def _match_summary(matches: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Match counts per confidence class, and the lines still pending"""
+    return {
+        "total_matches": len(matches),
+        "high_confidence": sum(1 for m in matches if m["confidence"] >= 0.9),
+        "medium_confidence": sum(1 for m in matches if 0.7 <= m["confidence"] < 0.9),
+        "low_confidence": sum(1 for m in matches if m["confidence"] < 0.7),
+        "pending": sum(1 for m in matches if m.get("status") == "pending"),
+    }
+
+
 @app.post("/api/matches/update")
 async def update_match(session_id: str, match_id: str, prijzenboek_code: str):
     """Update a specific match with a different prijzenboek item"""
@@ -307,6 +506,7 @@ async def update_match(session_id: str, match_id: str, prijzenboek_code: str):
                 match["prijzenboek_match"] = new_item
                 match["confidence"] = 1.0  # Manual selection = 100% confidence
                 match["match_type"] = "manual"
+                match["status"] = "auto"
 
                 return {"success": True, "match": match}
 
@@ -329,11 +529,13 @@ async def generate_excel(request: GenerateRequest):
         if not session["matches"]:
             raise HTTPException(status_code=400, detail="No matches found")
 
-        # Generate Excel file
-        output_path = generate_filled_excel(
+        # Generate Excel file (in a worker thread, so progress events reach the WebSocket meanwhile)
+        output_path = await run_in_threadpool(
+            generate_filled_excel,
             template_path=session["prijzenboek_path"],
             matches=session["matches"],
-            session_dir=UPLOAD_DIR / request.session_id
+            session_dir=UPLOAD_DIR / request.session_id,
+            progress=ProgressReporter(request.session_id, "generate_excel")
         )
 
         session["output_excel"] = output_path
@@ -375,6 +577,32 @@ async def download_excel(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.websocket("/ws/progress/{session_id}")
+async def progress_websocket(websocket: WebSocket, session_id: str):
+    """
+    Progress events of a session: {"stage", "done", "total", "finished", ...}
+    for parse_prijzenboek (rows), match (lines, ai_in_flight) and generate_excel (rows)
+    """
+    await websocket.accept()
+    hub = get_progress_hub()
+    queue = hub.subscribe(session_id)
+
+    async def forward():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    sender = asyncio.create_task(forward())
+    try:
+        # Clients don't send anything, receiving just notices the disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(session_id, queue)
+
+
 @app.get("/api/session/{session_id}/status")
 async def get_session_status(session_id: str):
     """Get session status"""
@@ -531,7 +759,7 @@ async def get_ai_config():
 
         return {
             "config": config.to_dict(),
-            "stats": get_ai_stats()
+            "stats": await run_in_threadpool(get_ai_stats)
         }
     except ImportError:
         return {
@@ -553,7 +781,7 @@ async def clear_ai_cache():
         except ImportError:
             from ai_matcher import clear_cache
 
-        clear_cache()
+        await run_in_threadpool(clear_cache)
         return {"success": True, "message": "AI cache cleared"}
     except ImportError:
         return {"success": False, "message": "AI modules not available"}
@@ -561,6 +789,53 @@ async def clear_ai_cache():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Matcher endpoints
+@app.get("/api/matcher/cache")
+async def get_match_cache_stats():
+    """Get match result cache statistics (hits, misses, size)"""
+    try:
+        try:
+            from .match_cache import get_match_cache
+        except ImportError:
+            from match_cache import get_match_cache
+
+        return get_match_cache().get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/matcher/metrics")
+async def get_matcher_metrics():
+    """Per-stage matcher metrics since startup (or the last reset)"""
+    registry = get_metrics_registry()
+    return {
+        "since": registry.started_at.isoformat(timespec="seconds"),
+        "stages": registry.snapshot()
+    }
+
+
+@app.post("/api/matcher/metrics/reset")
+async def reset_matcher_metrics():
+    """Reset the per-stage matcher metrics"""
+    get_metrics_registry().reset()
+    return {"success": True}
+
+
+@app.post("/api/matcher/clear-cache")
+async def clear_match_cache():
+    """Clear match result cache"""
+    try:
+        try:
+            from .match_cache import invalidate_match_cache
+        except ImportError:
+            from match_cache import invalidate_match_cache
+
+        invalidate_match_cache()
+        return {"success": True, "message": "Match cache cleared"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 class CorrectionRequest(BaseModel):
     """Model for correction request"""
     opname_text: str
@@ -710,7 +985,7 @@ async def ai_suggest_match(match_id: str, session_id: str):
         # Get top candidates for AI
         best_matches = find_best_matches(
             werkzaamheid,
-            session["prijzenboek_data"],
+            _get_session_index(session),
             top_n=config.MAX_CANDIDATES_FOR_AI
         )
 
@@ -0,0 +1,152 @@
+"""
+Cross-session cache for fuzzy match results
+Bounded LRU of ranked candidates per (prijzenboek version, normalized text,
+normalized unit, top_n), optionally persisted to SQLite so it survives restarts
+"""
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    from .config import config
+    from .metrics import sqlite_timer
+except ImportError:
+    from config import config
+    from metrics import sqlite_timer
+
+
+class MatchCache:
+    """LRU cache for ranked match candidates, with optional SQLite persistence"""
+
+    def __init__(self, max_entries: int = 10000, db_path: str = None):
+        self.max_entries = max_entries
+        self.db_path = str(db_path) if db_path else None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        if self.db_path:
+            self.init_db()
+
+    def get_connection(self):
+        """Get database connection"""
+        return sqlite3.connect(self.db_path)
+
+    def init_db(self):
+        """Initialize database schema for persisted match results"""
+        conn = self.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS match_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get cached value, or None (counted as hit/miss)"""
+        with self._lock:
+            value = self._entries.get(cache_key)
+            if value is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return value
+
+        if self.db_path:
+            with sqlite_timer():
+                conn = self.get_connection()
+                row = conn.execute(
+                    'SELECT value FROM match_cache WHERE cache_key = ?', (cache_key,)
+                ).fetchone()
+                conn.close()
+            if row:
+                value = json.loads(row[0])
+                with self._lock:
+                    self._store(cache_key, value)
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, cache_key: str, value: Dict[str, Any]):
+        """Store a value (must be JSON serializable)"""
+        with self._lock:
+            self._store(cache_key, value)
+
+        if self.db_path:
+            with sqlite_timer():
+                conn = self.get_connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO match_cache (cache_key, value) VALUES (?, ?)',
+                    (cache_key, json.dumps(value))
+                )
+                conn.commit()
+                conn.close()
+
+    def _store(self, cache_key: str, value: Dict[str, Any]):
+        self._entries[cache_key] = value
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop all cached results (prijzenboek changed)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+        if self.db_path:
+            conn = self.get_connection()
+            conn.execute('DELETE FROM match_cache')
+            conn.commit()
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": config.MATCH_CACHE_ENABLED,
+            "persistent": self.db_path is not None,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Singleton instance
+_match_cache_instance = None
+
+
+def get_match_cache() -> MatchCache:
+    """Get singleton match cache instance"""
+    global _match_cache_instance
+    if _match_cache_instance is None:
+        db_path = Path(__file__).parent / "match_cache.db" if config.MATCH_CACHE_PERSIST else None
+        _match_cache_instance = MatchCache(max_entries=config.MATCH_CACHE_MAX_ENTRIES, db_path=db_path)
+    return _match_cache_instance
+
+
+def invalidate_match_cache():
+    """Drop all cached match results"""
+    get_match_cache().invalidate()
+
+
+# Prijzenboek database writes invalidate cached matches
+try:
+    from .database import add_change_listener
+except ImportError:
+    from database import add_change_listener
+
+add_change_listener(invalidate_match_cache)
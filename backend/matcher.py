@@ -3,30 +3,56 @@ Fuzzy matching engine for werkzaamheden
 Matches opname werkzaamheden with prijzenboek items
 Supports AI-enhanced matching and learning from corrections
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Set, Tuple, Union
+from collections import Counter, OrderedDict
 from Levenshtein import ratio
+from contextlib import contextmanager
+import hashlib
+import heapq
+import json
+import math
+import re
+import time
 import uuid
 import asyncio
 
 # Import AI and corrections modules (optional dependencies)
 try:
     from .config import config
-    from .ai_matcher import ai_semantic_match
+    from .ai_matcher import ai_semantic_match, ai_semantic_match_batch
     from .corrections_db import get_corrections_db
     AI_MODULES_AVAILABLE = True
 except ImportError:
     try:
         from config import config
-        from ai_matcher import ai_semantic_match
+        from ai_matcher import ai_semantic_match, ai_semantic_match_batch
         from corrections_db import get_corrections_db
         AI_MODULES_AVAILABLE = True
     except ImportError:
         AI_MODULES_AVAILABLE = False
         config = None
         ai_semantic_match = None
+        ai_semantic_match_batch = None
         get_corrections_db = None
 
 
+# Per-stage instrumentation
+try:
+    from .metrics import record, stage_timer, sqlite_timer
+except ImportError:
+    from metrics import record, stage_timer, sqlite_timer
+
+
+# Cross-session match result cache
+try:
+    from .match_cache import get_match_cache
+except ImportError:
+    try:
+        from match_cache import get_match_cache
+    except ImportError:
+        get_match_cache = None
+
+
 def normalize_text(text: str) -> str:
     """Normalize text for better matching"""
     text = text.lower().strip()
@@ -65,19 +91,40 @@ CONSTRUCTION_SYNONYMS = {
 }
 
 
+# Reverse lookup: word -> every synonym it expands to (built once at import)
+_SYNONYM_LOOKUP: Dict[str, Set[str]] = {}
+for _key, _synonyms in CONSTRUCTION_SYNONYMS.items():
+    for _word in [_key] + _synonyms:
+        _SYNONYM_LOOKUP.setdefault(_word, set()).update(_synonyms)
+
+# Common stop words ignored by keyword matching
+STOP_WORDS = {'de', 'het', 'een', 'en', 'in', 'op', 'van', 'te', 'met', 'voor', 'inclusief', 'incl', 'per', 'stuk'}
+
+
 def expand_with_synonyms(text: str) -> str:
     """Expand text with construction synonyms for better matching"""
     words = text.lower().split()
     expanded_words = set(words)
 
     for word in words:
-        for key, synonyms in CONSTRUCTION_SYNONYMS.items():
-            if word in synonyms or word == key:
-                expanded_words.update(synonyms)
+        synonyms = _SYNONYM_LOOKUP.get(word)
+        if synonyms:
+            expanded_words.update(synonyms)
 
     return " ".join(expanded_words)
 
 
+def keyword_tokens(text: str) -> Set[str]:
+    """Synonym-expanded keyword set of a text, without stop words"""
+    return set(expand_with_synonyms(text).split()) - STOP_WORDS
+
+
+def char_trigrams(text_norm: str) -> Set[str]:
+    """Character trigrams of a normalized text, padded so word starts and ends count"""
+    padded = f"  {text_norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
 def normalize_unit(unit: str) -> str:
     """Normalize unit names"""
     unit = unit.lower().strip()
@@ -115,18 +162,11 @@ def calculate_keyword_score(query: str, target: str) -> float:
     Returns score 0.0 to 1.0 based on how many important words match
     Uses construction synonym expansion for better matching
     """
-    # Expand with synonyms for construction terms
-    query_expanded = expand_with_synonyms(query)
-    target_expanded = expand_with_synonyms(target)
-
-    query_words = set(query_expanded.split())
-    target_words = set(target_expanded.split())
+    return keyword_score_from_tokens(keyword_tokens(query), keyword_tokens(target))
 
-    # Remove common stop words
-    stop_words = {'de', 'het', 'een', 'en', 'in', 'op', 'van', 'te', 'met', 'voor', 'inclusief', 'incl', 'per', 'stuk'}
-    query_words = query_words - stop_words
-    target_words = target_words - stop_words
 
+def keyword_score_from_tokens(query_words: Set[str], target_words: Set[str]) -> float:
+    """Keyword score for two already expanded keyword sets (see keyword_tokens)"""
     if not query_words or not target_words:
         return 0.0
 
@@ -148,16 +188,26 @@ def calculate_fuzzy_score(query: str, target: str) -> float:
     Uses combination of Levenshtein ratio and keyword matching
     Returns score 0.0 to 1.0
     """
-    query_norm = normalize_text(query)
-    target_norm = normalize_text(target)
+    return fuzzy_score_prepared(
+        normalize_text(query), keyword_tokens(query),
+        normalize_text(target), keyword_tokens(target)
+    )
+
 
+def fuzzy_score_prepared(
+    query_norm: str,
+    query_tokens: Set[str],
+    target_norm: str,
+    target_tokens: Set[str]
+) -> float:
+    """Fuzzy score for texts that were already normalized and tokenized"""
     # Exact match
     if query_norm == target_norm:
         return 1.0
 
     # Calculate different scores
     levenshtein_score = ratio(query_norm, target_norm)
-    keyword_score = calculate_keyword_score(query, target)
+    keyword_score = keyword_score_from_tokens(query_tokens, target_tokens)
 
     # Substring match bonus
     substring_bonus = 0.0
@@ -171,83 +221,735 @@ def calculate_fuzzy_score(query: str, target: str) -> float:
     return min(1.0, best_score + substring_bonus)
 
 
+# Unit classes: units within one class are compatible (normalized names)
+UNIT_CLASSES = {
+    'length': {'m1', 'm', 'cm', 'mm'},
+    'area': {'m2', 'm²'},
+    'count': {'stu', 'stuks', 'st', 'stuk', 'pcs'},
+    'volume': {'m3', 'm³'},
+    'woning': {'won', 'woning'},
+    'ruimte': {'ruimte'},
+}
+
+# Score for two different units within the same class
+UNIT_CLASS_SCORES = {
+    'length': 0.7,
+    'area': 0.9,
+    'count': 0.9,
+    'volume': 0.9,
+    'woning': 0.9,
+    'ruimte': 0.9,
+}
+
+
+def unit_class(unit_norm: str) -> str:
+    """Return the unit class of a normalized unit, or 'unknown'"""
+    for name, units in UNIT_CLASSES.items():
+        if unit_norm in units:
+            return name
+    return 'unknown'
+
+
 def calculate_unit_score(opname_unit: str, prijzenboek_unit: str) -> float:
     """
     Calculate unit match score
     Returns 1.0 for exact match, 0.5 for compatible units, 0.0 for mismatch
     """
-    opname_norm = normalize_unit(opname_unit)
-    prijzenboek_norm = normalize_unit(prijzenboek_unit)
+    return unit_score_normalized(normalize_unit(opname_unit), normalize_unit(prijzenboek_unit))
 
+
+def unit_score_normalized(opname_norm: str, prijzenboek_norm: str) -> float:
+    """Unit match score for two units that were already normalized"""
     # Exact match
     if opname_norm == prijzenboek_norm:
         return 1.0
 
     # Compatible units (e.g., both are length measurements)
-    length_units = {'m1', 'm', 'cm', 'mm'}
-    area_units = {'m2', 'm²'}
-    count_units = {'stu', 'stuks', 'st', 'stuk', 'pcs'}
-    volume_units = {'m3', 'm³'}
-    woning_units = {'won', 'woning'}
-    ruimte_units = {'ruimte'}
-
-    if opname_norm in length_units and prijzenboek_norm in length_units:
-        return 0.7
-    if opname_norm in area_units and prijzenboek_norm in area_units:
-        return 0.9
-    if opname_norm in count_units and prijzenboek_norm in count_units:
-        return 0.9
-    if opname_norm in volume_units and prijzenboek_norm in volume_units:
-        return 0.9
-    if opname_norm in woning_units and prijzenboek_norm in woning_units:
-        return 0.9
-    if opname_norm in ruimte_units and prijzenboek_norm in ruimte_units:
-        return 0.9
+    opname_class = unit_class(opname_norm)
+    if opname_class != 'unknown' and opname_class == unit_class(prijzenboek_norm):
+        return UNIT_CLASS_SCORES[opname_class]
 
     # No match
     return 0.0
 
 
+def compute_prijzenboek_version(prijzenboek: List[Dict[str, Any]]) -> str:
+    """Content hash of a prijzenboek; changes whenever any item changes"""
+    data = json.dumps(prijzenboek, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class PrijzenboekIndex:
+    """
+    Precompiled prijzenboek for matching
+    Normalizes every item once, so scoring an opname line only has to
+    prepare the query side instead of the whole prijzenboek again
+    """
+
+    # Fraction of items above which a trigram is too common to retrieve candidates
+    TRIGRAM_MAX_FREQUENCY = 0.1
+
+    def __init__(self, prijzenboek: List[Dict[str, Any]], version: str = None):
+        self.items = list(prijzenboek)
+        self.version = version or compute_prijzenboek_version(self.items)
+
+        # Per item, aligned with self.items
+        self.normalized = [normalize_text(item.get("omschrijving", "")) for item in self.items]
+        self.tokens = [keyword_tokens(item.get("omschrijving", "")) for item in self.items]
+        self.units = [normalize_unit(item.get("eenheid", "")) for item in self.items]
+        self.unit_classes = [unit_class(unit) for unit in self.units]
+
+        # Derived structures built lazily by optional engines (e.g. batch_matcher)
+        self.cache: Dict[str, Any] = {}
+
+        # First item wins for duplicate codes (same as a linear scan)
+        self.by_code: Dict[str, Dict[str, Any]] = {}
+        for item in self.items:
+            self.by_code.setdefault(item.get("code"), item)
+
+        # Unit partitions: unit class -> ids, and exact normalized unit -> ids
+        self.unit_partitions: Dict[str, List[int]] = {}
+        self.by_unit: Dict[str, List[int]] = {}
+        for i, (unit, cls) in enumerate(zip(self.units, self.unit_classes)):
+            self.unit_partitions.setdefault(cls, []).append(i)
+            self.by_unit.setdefault(unit, []).append(i)
+
+        # Inverted index: keyword token -> ids of items containing it
+        self.postings: Dict[str, List[int]] = {}
+        for i, tokens in enumerate(self.tokens):
+            for token in tokens:
+                self.postings.setdefault(token, []).append(i)
+
+        # BM25 statistics (see bm25_scores)
+        self.avg_token_count = (sum(len(tokens) for tokens in self.tokens) / len(self.items)) if self.items else 0.0
+        self.idf: Dict[str, float] = {token: self.bm25_idf(len(ids)) for token, ids in self.postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def get_item_by_code(self, code: str) -> Optional[Dict[str, Any]]:
+        """Get prijzenboek item by code"""
+        return self.by_code.get(code)
+
+    def compatible_ids(self, unit_norm: str) -> Set[int]:
+        """Ids of items whose unit is compatible with a normalized unit (unit score > 0)"""
+        return set(self.compatible_id_list(unit_norm))
+
+    def compatible_id_list(self, unit_norm: str) -> List[int]:
+        """Same as compatible_ids, as the (uncopied) partition list in prijzenboek order"""
+        cls = unit_class(unit_norm)
+        if cls == 'unknown':
+            return self.by_unit.get(unit_norm, [])
+        return self.unit_partitions.get(cls, [])
+
+    def candidate_ids(self, query_tokens: Set[str]) -> List[int]:
+        """Ids of items sharing at least one keyword token, in prijzenboek order"""
+        ids = set()
+        for token in query_tokens:
+            ids.update(self.postings.get(token, ()))
+        return sorted(ids)
+
+    def trigram_postings(self) -> Tuple[Dict[str, List[int]], List[int]]:
+        """Character trigram -> ids of items containing it, and the trigram count per item (cached)"""
+        if "trigrams" not in self.cache:
+            postings: Dict[str, List[int]] = {}
+            sizes = []
+            for i, target_norm in enumerate(self.normalized):
+                trigrams = char_trigrams(target_norm)
+                sizes.append(len(trigrams))
+                for trigram in trigrams:
+                    postings.setdefault(trigram, []).append(i)
+            self.cache["trigrams"] = (postings, sizes)
+        return self.cache["trigrams"]
+
+    def trigram_candidate_ids(self, query_norm: str, limit: int) -> List[int]:
+        """
+        Ids of the `limit` items with the highest character trigram overlap
+        (Dice coefficient) with a normalized query, in prijzenboek order
+        Typos only break a few trigrams, so misspelled words still retrieve their items
+        Trigrams found in more than TRIGRAM_MAX_FREQUENCY of all items (" de", "en ")
+        are skipped like stop words: they barely separate items but cost the most
+        """
+        postings, sizes = self.trigram_postings()
+
+        query_trigrams = char_trigrams(query_norm)
+        max_frequency = self.TRIGRAM_MAX_FREQUENCY * len(self.items)
+        shared = Counter()
+        for trigram in query_trigrams:
+            ids = postings.get(trigram)
+            if ids and len(ids) <= max_frequency:
+                shared.update(ids)
+
+        query_size = len(query_trigrams)
+        best = heapq.nlargest(limit, shared.items(), key=lambda entry: 2 * entry[1] / (query_size + sizes[entry[0]]))
+        return sorted(i for i, _ in best)
+
+    def bm25_idf(self, document_frequency: int) -> float:
+        """BM25 inverse document frequency (always positive)"""
+        n = len(self.items)
+        return math.log(1 + (n - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+# Recently built indexes, keyed by prijzenboek version
+_index_cache: "OrderedDict[str, PrijzenboekIndex]" = OrderedDict()
+_INDEX_CACHE_SIZE = 4
+
+
+def get_prijzenboek_index(
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex]
+) -> PrijzenboekIndex:
+    """
+    Get the PrijzenboekIndex for a prijzenboek
+    Indexes are built once per prijzenboek version and reused afterwards
+    (a list is hashed on every call: callers matching many lines should
+    get the index once and pass it down)
+    """
+    if isinstance(prijzenboek, PrijzenboekIndex):
+        return prijzenboek
+
+    version = compute_prijzenboek_version(prijzenboek)
+    index = _index_cache.get(version)
+    if index is None:
+        index = PrijzenboekIndex(prijzenboek, version=version)
+        _index_cache[version] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    else:
+        _index_cache.move_to_end(version)
+
+    return index
+
+
 def find_best_matches(
     werkzaamheid: Dict[str, Any],
-    prijzenboek: List[Dict[str, Any]],
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex],
     top_n: int = 5
 ) -> List[tuple]:
     """
     Find top N best matches for a werkzaamheid
-    Returns list of (prijzenboek_item, score) tuples
+    Accepts a PrijzenboekIndex or a plain list of prijzenboek items
+    Returns list of (prijzenboek_item, score, text_score, unit_score) tuples
     """
-    matches = []
+    matches, _ = find_best_matches_with_info(werkzaamheid, prijzenboek, top_n=top_n)
+    return matches
 
-    for item in prijzenboek:
-        # Calculate text similarity score
-        text_score = calculate_fuzzy_score(
-            werkzaamheid.get("omschrijving", ""),
-            item.get("omschrijving", "")
-        )
 
-        # Calculate unit match score
-        unit_score = calculate_unit_score(
-            werkzaamheid.get("eenheid", ""),
-            item.get("eenheid", "")
-        )
+def find_best_matches_with_info(
+    werkzaamheid: Dict[str, Any],
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex],
+    top_n: int = 5,
+    use_cache: bool = True
+) -> Tuple[List[tuple], Dict[str, Any]]:
+    """
+    Same as find_best_matches, plus search info:
+        unit_fallback: items outside the opname unit class had to be searched
+        items_scored: number of prijzenboek items that were scored
+        full_evaluations: items for which Levenshtein was computed
+        evaluations_skipped: items skipped on their upper bound
+    """
+    with stage_timer("find_best_matches") as measurement:
+        return _find_best_matches_with_info(werkzaamheid, prijzenboek, top_n, use_cache, measurement)
 
-        # Combined score (weighted)
-        # Text: 70%, Unit: 30%
-        combined_score = (text_score * 0.7) + (unit_score * 0.3)
 
-        matches.append((item, combined_score, text_score, unit_score))
+def _find_best_matches_with_info(
+    werkzaamheid: Dict[str, Any],
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex],
+    top_n: int,
+    use_cache: bool,
+    measurement: Dict[str, Any]
+) -> Tuple[List[tuple], Dict[str, Any]]:
+    """find_best_matches_with_info, reporting the items scored in measurement"""
+    index = get_prijzenboek_index(prijzenboek)
+
+    # Prepare the query side once
+    omschrijving = werkzaamheid.get("omschrijving", "")
+    query_norm = normalize_text(omschrijving)
+    query_tokens = keyword_tokens(omschrijving)
+    query_unit = normalize_unit(werkzaamheid.get("eenheid", ""))
+
+    # Consult the cross-session cache first
+    cache = _match_cache() if use_cache else None
+    if cache is not None:
+        cache_key = match_cache_key(index, (query_norm, query_unit), top_n, _pruning_enabled())
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _from_cache_value(index, cached)
+
+    # Search the unit-compatible partition first
+    compatible = index.compatible_ids(query_unit) if _unit_partitioning_enabled() else None
+
+    # Vector engine similarities (candidates and extra text score component)
+    vector_scores = _vector_scores(index, omschrijving)
+
+    if _text_scorer() == "bm25" and query_tokens:
+        matches, info = _find_best_matches_bm25(
+            index, top_n, query_norm, query_tokens, query_unit, compatible, vector_scores
+        )
+        measurement["items_scored"] = info["items_scored"]
+        if cache is not None:
+            cache.put(cache_key, {
+                "matches": [[i, score, text_score, unit_score] for _, score, text_score, unit_score, i in matches],
+                "info": info
+            })
+        return [match[:4] for match in matches], info
+
+    top = _TopMatches(index, top_n, query_norm, query_tokens, query_unit, vector_scores)
+
+    def in_class(ids):
+        return ids if compatible is None else [i for i in ids if i in compatible]
+
+    def out_class(ids):
+        return [] if compatible is None else [i for i in ids if i not in compatible]
+
+    def needs_unit_fallback():
+        return compatible is not None and (top.offered < top_n or top.best_score() < _unit_fallback_score())
+
+    candidates = _select_candidates(index, query_norm, query_tokens, top_n, vector_scores)
+    top.offer(in_class(candidates))
+
+    unit_fallback = False
+    if needs_unit_fallback():
+        unit_fallback = True
+        top.offer(out_class(candidates))
+
+    # Weak best candidate: items without shared tokens may still win on Levenshtein
+    if len(candidates) < len(index.items) and top.best_score() < _pruning_fallback_score():
+        candidate_set = set(candidates)
+        remaining = [i for i in range(len(index.items)) if i not in candidate_set]
+        top.offer(remaining if unit_fallback else in_class(remaining))
+        if not unit_fallback and needs_unit_fallback():
+            unit_fallback = True
+            top.offer(out_class(remaining))
+
+    matches = top.ranked()
+
+    info = {
+        "unit_fallback": unit_fallback,
+        "items_scored": top.offered,
+        "full_evaluations": top.full_evaluations,
+        "evaluations_skipped": top.offered - top.full_evaluations,
+    }
+    measurement["items_scored"] = top.offered
 
-    # Sort by combined score (descending)
-    matches.sort(key=lambda x: x[1], reverse=True)
+    if cache is not None:
+        cache.put(cache_key, {
+            "matches": [[i, score, text_score, unit_score] for _, score, text_score, unit_score, i in matches],
+            "info": info
+        })
 
     # Return top N matches
-    return matches[:top_n]
+    return [match[:4] for match in matches], info
+
+
+def _match_cache():
+    """The match cache, or None when disabled/unavailable"""
+    if get_match_cache is None or config is None or not config.MATCH_CACHE_ENABLED:
+        return None
+    return get_match_cache()
+
+
+def match_cache_key(
+    index: PrijzenboekIndex,
+    key: Tuple[str, str],
+    top_n: int,
+    pruning: bool
+) -> str:
+    """
+    Match cache key for a line_key: prijzenboek version, normalized text and
+    unit, top_n and every setting that can change the ranking
+    """
+    data = [index.version, key[0], key[1], top_n, pruning]
+    if config is not None:
+        data += [
+            config.PRUNING_MIN_QUERY_LENGTH, config.PRUNING_FALLBACK_SCORE,
+            config.UNIT_PARTITIONING_ENABLED, config.UNIT_FALLBACK_SCORE,
+            config.TEXT_SCORER, config.BM25_K1, config.BM25_B,
+            config.CANDIDATE_RETRIEVAL, config.TRIGRAM_CANDIDATES,
+            config.VECTOR_ENGINE_ENABLED, config.VECTOR_DIMENSIONS, config.VECTOR_CANDIDATES,
+            config.SPELLING_CORRECTION_ENABLED, config.SPELLING_MAX_EDIT_DISTANCE,
+        ]
+    return hashlib.sha1(json.dumps(data).encode()).hexdigest()
+
+
+def _from_cache_value(index: PrijzenboekIndex, value: Dict[str, Any]) -> Tuple[List[tuple], Dict[str, Any]]:
+    """Cached (item id, scores) lists back to (item, score, text_score, unit_score) tuples"""
+    matches = [(index.items[i], score, text_score, unit_score) for i, score, text_score, unit_score in value["matches"]]
+    return matches, dict(value["info"])
+
+
+def _cached_matches(
+    index: PrijzenboekIndex,
+    werkzaamheid: Dict[str, Any],
+    top_n: int,
+    pruning: bool
+) -> Optional[Tuple[List[tuple], Dict[str, Any]]]:
+    """Cached (matches, search_info) of a line, or None when not cached"""
+    cache = _match_cache()
+    if cache is None:
+        return None
+    cached = cache.get(match_cache_key(index, line_key(werkzaamheid), top_n, pruning))
+    return _from_cache_value(index, cached) if cached is not None else None
+
+
+def _best_score(matches: List[tuple]) -> float:
+    return max((match[1] for match in matches), default=0.0)
+
+
+class _TopMatches:
+    """
+    Keeps the N best matches of one query while items are offered
+    Items whose upper bound (length ratio limit on Levenshtein, exact keyword,
+    vector and substring scores) cannot beat the current N-th best are skipped
+    without computing Levenshtein; the ranking equals a full sort
+    """
+
+    # Guards the bounds against float rounding
+    EPSILON = 1e-9
+
+    def __init__(
+        self,
+        index: PrijzenboekIndex,
+        top_n: int,
+        query_norm: str,
+        query_tokens: Set[str],
+        query_unit: str,
+        vector_scores=None
+    ):
+        self.index = index
+        self.top_n = top_n
+        self.query_norm = query_norm
+        self.query_tokens = query_tokens
+        self.query_unit = query_unit
+        self.vector_scores = vector_scores
+        self.heap: List[tuple] = []  # (score, -id, text_score, unit_score), worst on top
+        self.offered = 0
+        self.full_evaluations = 0
+        self._unit_scores: Dict[str, float] = {}
+
+    def best_score(self) -> float:
+        return max((entry[0] for entry in self.heap), default=0.0)
+
+    def offer(self, ids):
+        """Score the given item ids, keeping the best N"""
+        index = self.index
+        query_norm = self.query_norm
+        query_len = len(query_norm)
+        heap = self.heap
+
+        for i in ids:
+            self.offered += 1
+            target_norm = index.normalized[i]
+
+            # Calculate unit match score
+            unit = index.units[i]
+            unit_score = self._unit_scores.get(unit)
+            if unit_score is None:
+                unit_score = self._unit_scores[unit] = unit_score_normalized(self.query_unit, unit)
+
+            if query_norm == target_norm:
+                # Exact match
+                text_score = 1.0
+            else:
+                keyword_score = keyword_score_from_tokens(self.query_tokens, index.tokens[i])
+                # Best score without Levenshtein: boosted keyword or vector similarity
+                other_score = keyword_score * 1.2
+                if self.vector_scores is not None:
+                    other_score = max(other_score, float(self.vector_scores[i]))
+                substring_bonus = 0.15 if query_norm in target_norm or target_norm in query_norm else 0.0
+                levenshtein_cutoff = None
+
+                if len(heap) >= self.top_n:
+                    worst_score, worst_neg_id = heap[0][0], heap[0][1]
+
+                    # Levenshtein ratio is at most 2 * shorter / total length
+                    total_len = query_len + len(target_norm)
+                    levenshtein_bound = 2 * min(query_len, len(target_norm)) / total_len if total_len else 1.0
+                    text_bound = min(1.0, max(levenshtein_bound + self.EPSILON, other_score) + substring_bonus)
+                    if (text_bound * 0.7 + unit_score * 0.3, -i) < (worst_score, worst_neg_id):
+                        continue
+
+                    # Levenshtein below this can't lift the item into the top N
+                    needed = (worst_score - unit_score * 0.3) / 0.7 - substring_bonus - self.EPSILON
+                    if needed > other_score:
+                        levenshtein_cutoff = needed
+
+                self.full_evaluations += 1
+                if levenshtein_cutoff is not None:
+                    levenshtein_score = ratio(query_norm, target_norm, score_cutoff=levenshtein_cutoff)
+                    if levenshtein_score == 0.0:
+                        continue
+                else:
+                    levenshtein_score = ratio(query_norm, target_norm)
+
+                # Same blend as fuzzy_score_prepared (plus the vector score when enabled)
+                best_score = max(levenshtein_score, other_score)
+                text_score = min(1.0, best_score + substring_bonus)
+
+            # Combined score (weighted)
+            # Text: 70%, Unit: 30%
+            combined_score = (text_score * 0.7) + (unit_score * 0.3)
+
+            entry = (combined_score, -i, text_score, unit_score)
+            if len(heap) < self.top_n:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+    def ranked(self) -> List[tuple]:
+        """Best N as (item, score, text_score, unit_score, id), best first, prijzenboek order for ties"""
+        return [
+            (self.index.items[-neg_id], score, text_score, unit_score, -neg_id)
+            for score, neg_id, text_score, unit_score in sorted(self.heap, key=lambda e: (-e[0], -e[1]))
+        ]
+
+
+def _bm25_norms(index: PrijzenboekIndex) -> List[float]:
+    """Per item BM25 length normalization, cached per parameter set"""
+    k1, b = _bm25_parameters()
+    norms_key = ("bm25_norms", k1, b)
+    if norms_key not in index.cache:
+        avg_count = index.avg_token_count or 1.0
+        index.cache[norms_key] = [k1 * (1 - b + b * len(tokens) / avg_count) for tokens in index.tokens]
+    return index.cache[norms_key]
+
+
+def bm25_scores(
+    index: PrijzenboekIndex,
+    query_tokens: Set[str],
+    ids: Optional[List[int]] = None
+) -> Dict[int, float]:
+    """
+    BM25 text scores (0..1) of all items sharing a keyword token with the query
+    Sparse dot product over the postings of the query tokens; tokens are
+    synonym-expanded sets, so term frequencies are 1. Scores are divided by
+    the score of the query against itself, so an item with the same keywords
+    scores about 1.0 and the confidence thresholds keep their meaning.
+    With ids, only those items are scored (without walking the postings).
+    """
+    k1, b = _bm25_parameters()
+    avg_count = index.avg_token_count or 1.0
+    norms = _bm25_norms(index)
+
+    weights = {token: index.idf[token] * (k1 + 1) for token in query_tokens if token in index.idf}
+    scores: Dict[int, float] = {}
+    if ids is None:
+        for token, weight in weights.items():
+            for i in index.postings[token]:
+                scores[i] = scores.get(i, 0.0) + weight / (1 + norms[i])
+    else:
+        query_set = weights.keys()
+        for i in ids:
+            shared = query_set & index.tokens[i]
+            if shared:
+                scores[i] = sum(weights[token] for token in shared) / (1 + norms[i])
+
+    # Tokens that appear nowhere in the prijzenboek still count against coverage
+    query_norm = k1 * (1 - b + b * len(query_tokens) / avg_count)
+    self_score = sum(
+        index.idf.get(token, index.bm25_idf(0)) * (k1 + 1) / (1 + query_norm)
+        for token in query_tokens
+    )
+    if not self_score:
+        return {}
+
+    return {i: min(1.0, score / self_score) for i, score in scores.items()}
+
+
+def _find_best_matches_bm25(
+    index: PrijzenboekIndex,
+    top_n: int,
+    query_norm: str,
+    query_tokens: Set[str],
+    query_unit: str,
+    compatible: Optional[Set[int]],
+    vector_scores=None,
+    candidate_ids: Optional[List[int]] = None
+) -> Tuple[List[tuple], Dict[str, Any]]:
+    """
+    Best matches with BM25 as text score, (item, score, text_score, unit_score, id) like _TopMatches.ranked
+    With candidate_ids only those items are ranked, instead of every item sharing a keyword
+    """
+    text_scores = bm25_scores(index, query_tokens, candidate_ids)
+
+    # Vector similarity as an alternative text score
+    if vector_scores is not None:
+        for i in _vector_candidates(vector_scores):
+            text_scores[i] = max(text_scores.get(i, 0.0), float(vector_scores[i]))
+
+    # Exact match
+    for i in exact_ids(index).get(query_norm, ()):
+        text_scores[i] = 1.0
+
+    unit_scores: Dict[str, float] = {}
+
+    def ranked(ids) -> List[tuple]:
+        entries = []
+        for i in ids:
+            unit = index.units[i]
+            unit_score = unit_scores.get(unit)
+            if unit_score is None:
+                unit_score = unit_scores[unit] = unit_score_normalized(query_unit, unit)
+            text_score = text_scores.get(i, 0.0)
+
+            # Combined score (weighted)
+            # Text: 70%, Unit: 30%
+            entries.append(((text_score * 0.7) + (unit_score * 0.3), -i, text_score, unit_score))
+        return [
+            (index.items[-neg_id], score, text_score, unit_score, -neg_id)
+            for score, neg_id, text_score, unit_score in heapq.nlargest(top_n, entries)
+        ]
+
+    # Items without a shared token (or vector neighbour) only fill up a short list
+    if candidate_ids is not None:
+        candidates = candidate_ids
+    else:
+        candidates = sorted(text_scores)
+        if len(candidates) < top_n:
+            candidates = range(len(index.items))
+
+    unit_fallback = False
+    matches = ranked(candidates if compatible is None else [i for i in candidates if i in compatible])
+    if compatible is not None and (len(matches) < top_n or _best_score(matches) < _unit_fallback_score()):
+        unit_fallback = True
+        matches = ranked(candidates)
+
+    info = {
+        "unit_fallback": unit_fallback,
+        "items_scored": len(candidates),
+        "full_evaluations": 0,
+        "evaluations_skipped": len(candidates),
+    }
+    return matches, info
+
+
+def exact_ids(index: PrijzenboekIndex) -> Dict[str, List[int]]:
+    """Normalized omschrijving -> ids of items with exactly that text (cached on the index)"""
+    if "exact" not in index.cache:
+        exact: Dict[str, List[int]] = {}
+        for i, target_norm in enumerate(index.normalized):
+            exact.setdefault(target_norm, []).append(i)
+        index.cache["exact"] = exact
+    return index.cache["exact"]
+
+
+def _select_candidates(
+    index: PrijzenboekIndex,
+    query_norm: str,
+    query_tokens: Set[str],
+    top_n: int,
+    vector_scores=None
+):
+    """
+    Select the item ids worth scoring for a query
+    Uses the inverted token index and/or the character trigram index (typo
+    tolerant), plus the nearest items of the vector engine; falls back to the whole prijzenboek for short queries (where
+    Levenshtein alone decides) and for queries that retrieve too few items
+    to fill the top N
+    """
+    all_ids = range(len(index.items))
+
+    if not _pruning_enabled():
+        return all_ids
+
+    min_length = config.PRUNING_MIN_QUERY_LENGTH if config is not None else 4
+    if len(query_norm) < min_length:
+        return all_ids
+
+    retrieval = config.CANDIDATE_RETRIEVAL if config is not None else "tokens"
+    if retrieval == "tokens" and not query_tokens:
+        return all_ids
+
+    candidates = set()
+    if retrieval in ("tokens", "hybrid"):
+        candidates.update(index.candidate_ids(query_tokens))
+    if retrieval in ("trigram", "hybrid"):
+        limit = config.TRIGRAM_CANDIDATES if config is not None else 300
+        candidates.update(index.trigram_candidate_ids(query_norm, limit))
+    if vector_scores is not None:
+        candidates.update(_vector_candidates(vector_scores))
+
+    if len(candidates) < top_n:
+        return all_ids
+
+    return sorted(candidates)
+
+
+def _pruning_enabled() -> bool:
+    return config.CANDIDATE_PRUNING_ENABLED if config is not None else True
+
+
+def _unit_partitioning_enabled() -> bool:
+    return config.UNIT_PARTITIONING_ENABLED if config is not None else True
+
+
+def _unit_fallback_score() -> float:
+    """
+    Best in-class score below which other unit classes are searched too
+    Items of another class have unit score 0, so they score at most 0.7:
+    at the default of 0.7 the best match is the same as a full search
+    """
+    return config.UNIT_FALLBACK_SCORE if config is not None else 0.7
+
+
+def _pruning_fallback_score() -> float:
+    """Best pruned score below which the whole prijzenboek is scored anyway"""
+    return config.PRUNING_FALLBACK_SCORE if config is not None else 0.7
+
+
+def _vector_scores(index: PrijzenboekIndex, text: str):
+    """Vector engine similarity of a text with every item, or None when the vector engine is off"""
+    if config is None or not config.VECTOR_ENGINE_ENABLED:
+        return None
+    try:
+        from .vector_engine import get_vector_index
+    except ImportError:
+        from vector_engine import get_vector_index
+    vectors = get_vector_index(index)
+    return vectors.scores(text) if vectors is not None else None
+
+
+def _vector_candidates(vector_scores) -> List[int]:
+    """Ids of the nearest items by vector similarity"""
+    try:
+        from .vector_engine import top_ids
+    except ImportError:
+        from vector_engine import top_ids
+    return top_ids(vector_scores, config.VECTOR_CANDIDATES)
+
+
+def _spelling_correction_enabled() -> bool:
+    return config.SPELLING_CORRECTION_ENABLED if config is not None else False
+
+
+def _correct_spelling(
+    werkzaamheid: Dict[str, Any],
+    index: PrijzenboekIndex
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Spelling-corrected werkzaamheid and spelling info (see spelling.correct_werkzaamheid)"""
+    try:
+        from .spelling import correct_werkzaamheid
+    except ImportError:
+        from spelling import correct_werkzaamheid
+    return correct_werkzaamheid(werkzaamheid, index)
+
+
+def _text_scorer() -> str:
+    """'fuzzy' (Levenshtein + keyword blend) or 'bm25'"""
+    return config.TEXT_SCORER if config is not None else "fuzzy"
+
+
+def _bm25_parameters() -> Tuple[float, float]:
+    if config is None:
+        return 1.2, 0.75
+    return config.BM25_K1, config.BM25_B
 
 
 def check_learned_correction(
     werkzaamheid: Dict[str, Any],
-    prijzenboek: List[Dict[str, Any]]
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex]
 ) -> Optional[Dict[str, Any]]:
     """
     Check if we have a learned correction for this werkzaamheid
@@ -258,25 +960,31 @@ def check_learned_correction(
     if not AI_MODULES_AVAILABLE or not config or not config.LEARNING_ENABLED:
         return None
 
-    corrections_db = get_corrections_db()
-    learned = corrections_db.find_learned_match(
-        werkzaamheid.get("omschrijving", ""),
-        werkzaamheid.get("eenheid", ""),
-        min_frequency=config.MIN_CORRECTION_FREQUENCY
-    )
+    with stage_timer("check_learned_correction"):
+        corrections_db = get_corrections_db()
+        with sqlite_timer():
+            learned = corrections_db.find_learned_match(
+                werkzaamheid.get("omschrijving", ""),
+                werkzaamheid.get("eenheid", ""),
+                min_frequency=config.MIN_CORRECTION_FREQUENCY
+            )
 
-    if learned:
-        # Find the corresponding prijzenboek item
-        for item in prijzenboek:
-            if item.get("code") == learned["code"]:
-                return item
+        if learned:
+            # Find the corresponding prijzenboek item
+            if isinstance(prijzenboek, PrijzenboekIndex):
+                return prijzenboek.get_item_by_code(learned["code"])
+            for item in prijzenboek:
+                if item.get("code") == learned["code"]:
+                    return item
 
     return None
 
 
 async def apply_ai_matching(
     werkzaamheid: Dict[str, Any],
-    candidates: List[tuple]
+    candidates: List[tuple],
+    semaphore: Optional[asyncio.Semaphore] = None,
+    deadline: Optional[float] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Apply AI semantic matching to re-rank candidates
@@ -284,6 +992,8 @@ async def apply_ai_matching(
     Args:
         werkzaamheid: The work item to match
         candidates: List of (item, score, text_score, unit_score) tuples
+        semaphore: Shared limit on concurrent API calls (optional)
+        deadline: time.perf_counter() value after which API calls stop (optional)
 
     Returns:
         Dict with ai_result if successful, None otherwise
@@ -297,34 +1007,447 @@ async def apply_ai_matching(
     # Prepare candidates for AI matching
     candidate_items = [item for item, _, _, _ in candidates]
 
+    with stage_timer("apply_ai_matching") as measurement:
+        measurement["items_scored"] = len(candidate_items)
+        try:
+            ai_result = await ai_semantic_match(werkzaamheid, candidate_items, semaphore, deadline)
+            return ai_result
+        except Exception as e:
+            print(f"AI matching failed: {e}")
+            return None
+
+
+async def apply_ai_matching_batch(
+    lines: List[Tuple[Dict[str, Any], List[tuple]]],
+    semaphore: Optional[asyncio.Semaphore] = None,
+    deadline: Optional[float] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    apply_ai_matching for several lines in one API call
+
+    Args:
+        lines: (werkzaamheid, candidates) per line, candidates as in apply_ai_matching
+        semaphore, deadline: as in apply_ai_matching, for the batch call and each retry
+
+    Returns:
+        AI result (or None) per line
+    """
+    if not AI_MODULES_AVAILABLE or not config or not config.is_ai_available():
+        return [None] * len(lines)
+
+    items = [
+        (werkzaamheid, [item for item, _, _, _ in candidates] if len(candidates) >= 2 else [])
+        for werkzaamheid, candidates in lines
+    ]
+
+    with stage_timer("apply_ai_matching") as measurement:
+        measurement["items_scored"] = sum(len(candidates) for _, candidates in items)
+        try:
+            return await ai_semantic_match_batch(items, semaphore, deadline)
+        except Exception as e:
+            print(f"AI batch matching failed: {e}")
+            return [None] * len(lines)
+
+
+# Confidence from which a match is accepted without review
+AUTO_CONFIDENCE = 0.9
+
+
+def line_key(werkzaamheid: Dict[str, Any]) -> Tuple[str, str]:
+    """Key under which identical opname lines share one match"""
+    return (
+        normalize_text(werkzaamheid.get("omschrijving", "")),
+        normalize_unit(werkzaamheid.get("eenheid", ""))
+    )
+
+
+def _match_id(werkzaamheid: Dict[str, Any]) -> str:
+    """Id of a match result: kept when a line is matched again (see refine_pending_matches)"""
+    return werkzaamheid.get("match_id") or str(uuid.uuid4())
+
+
+def _opname_item(werkzaamheid: Dict[str, Any]) -> Dict[str, Any]:
+    """Opname part of a match result"""
+    return {
+        "omschrijving": werkzaamheid["omschrijving"],
+        "hoeveelheid": werkzaamheid["hoeveelheid"],
+        "eenheid": werkzaamheid["eenheid"],
+        "raw_text": werkzaamheid.get("raw_text", "")
+    }
+
+
+def _prijzenboek_match(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Prijzenboek part of a match result"""
+    return {
+        "code": item["code"],
+        "omschrijving": item["omschrijving"],
+        "omschrijving_offerte": item.get("omschrijving_offerte", item["omschrijving"]),
+        "eenheid": item["eenheid"],
+        "materiaal": item.get("materiaal", 0),
+        "uren": item.get("uren", 0),
+        "prijs_per_stuk": item.get("prijs_per_stuk", 0),
+        "prijs_excl": item.get("totaal_excl", item.get("prijs_per_stuk", 0)),
+        "prijs_incl": item.get("totaal_incl", 0),
+        "row_num": item.get("row_num", None)
+    }
+
+
+def _build_learned_result(
+    ruimte_naam: str,
+    werkzaamheid: Dict[str, Any],
+    learned_item: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Match result for a learned correction (100% confidence)"""
+    return {
+        "id": _match_id(werkzaamheid),
+        "ruimte": ruimte_naam,
+        "opname_item": _opname_item(werkzaamheid),
+        "prijzenboek_match": _prijzenboek_match(learned_item),
+        "confidence": 1.0,
+        "text_score": 1.0,
+        "unit_score": 1.0,
+        "match_type": "learned",
+        "ai_reasoning": "Match gebaseerd op eerdere gebruikerscorrecties",
+        "status": "auto",
+        "unit_fallback": False,
+        "spelling": None,
+        "alternatives": []
+    }
+
+
+def _build_match_result(
+    ruimte_naam: str,
+    werkzaamheid: Dict[str, Any],
+    best_matches: List[tuple],
+    confidence: float,
+    text_score: float,
+    unit_score: float,
+    match_type: str = "fuzzy",
+    ai_reasoning: Optional[str] = None,
+    unit_fallback: bool = False,
+    spelling: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Match result for the first of best_matches, the rest become alternatives"""
+    best_item = best_matches[0][0]
+
+    # Get alternative matches for user review
+    alternatives = [
+        {
+            "code": item["code"],
+            "omschrijving": item["omschrijving"],
+            "eenheid": item["eenheid"],
+            "prijs_excl": item.get("totaal_excl", item.get("prijs_per_stuk", 0)),
+            "prijs_incl": item.get("totaal_incl", 0),
+            "score": score
+        }
+        for item, score, _, _ in best_matches[1:5]
+    ]
+
+    return {
+        "id": _match_id(werkzaamheid),
+        "ruimte": ruimte_naam,
+        "opname_item": _opname_item(werkzaamheid),
+        "prijzenboek_match": _prijzenboek_match(best_item),
+        "confidence": round(confidence, 3),
+        "text_score": round(text_score, 3),
+        "unit_score": round(unit_score, 3),
+        "match_type": match_type,
+        "ai_reasoning": ai_reasoning,
+        # A match found through a spelling correction is always reviewed
+        "status": "auto" if confidence >= AUTO_CONFIDENCE and not spelling else "review",
+        "unit_fallback": unit_fallback,
+        "spelling": spelling,
+        "alternatives": alternatives
+    }
+
+
+def prepare_prijzenboek_index(index: PrijzenboekIndex, engine: Optional[str] = None):
+    """
+    Build the lookup structures an index otherwise builds on first use (cached
+    on the index), e.g. right after a prijzenboek upload, so the first match
+    doesn't spend its time budget on them
+    """
+    engine = _resolve_engine(engine)
+    exact_ids(index)
+    # Provisional matches rank with BM25
+    _bm25_norms(index)
+
+    retrieval = config.CANDIDATE_RETRIEVAL if config is not None else "tokens"
+    if retrieval in ("trigram", "hybrid"):
+        index.trigram_postings()
+
+    if engine == "batch":
+        try:
+            from .batch_matcher import prepare_index
+        except ImportError:
+            from batch_matcher import prepare_index
+        prepare_index(index)
+
+    if config is not None and config.VECTOR_ENGINE_ENABLED:
+        try:
+            from .vector_engine import get_vector_index
+        except ImportError:
+            from vector_engine import get_vector_index
+        get_vector_index(index)
+
+
+def _resolve_engine(engine: Optional[str]) -> str:
+    """Pick the matcher engine: explicit argument, then config, then 'standard'"""
+    if engine is None:
+        engine = config.MATCHER_ENGINE if config is not None else "standard"
+    if engine == "batch" and not _batch_engine_available():
+        print("Batch matcher engine not available (numpy/rapidfuzz missing), using standard engine")
+        return "standard"
+    if engine == "batch" and _text_scorer() == "bm25":
+        # The batch engine implements the fuzzy scorer; BM25 is sparse per line already
+        return "standard"
+    return engine
+
+
+def _batch_engine_available() -> bool:
     try:
-        ai_result = await ai_semantic_match(werkzaamheid, candidate_items)
-        return ai_result
-    except Exception as e:
-        print(f"AI matching failed: {e}")
+        from .batch_matcher import BATCH_ENGINE_AVAILABLE
+    except ImportError:
+        from batch_matcher import BATCH_ENGINE_AVAILABLE
+    return BATCH_ENGINE_AVAILABLE
+
+
+# Lines (per worker) scored up front between two deadline checks
+DEADLINE_ROUND_LINES = 4
+
+
+async def _find_best_matches_up_front(
+    lines: Dict[Tuple[str, str], Dict[str, Any]],
+    index: PrijzenboekIndex,
+    top_n: int,
+    engine: str,
+    deadline: Optional[float] = None
+) -> Dict[Tuple[str, str], Tuple[List[tuple], Dict[str, Any]]]:
+    """
+    Best matches with search info per line_key, using the match cache
+    and the batch engine and/or process pool for the cache misses
+    lines holds the werkzaamheid to score per line_key (spelling-corrected
+    when enabled). With a deadline (time.perf_counter) the misses are scored
+    in rounds of DEADLINE_ROUND_LINES per worker, and a process pool round is
+    only waited for until the deadline; lines left when it passes are not in
+    the result.
+    """
+    results = {}
+    pruning = _pruning_enabled() and engine != "batch"
+    cache = _match_cache()
+    cache_keys = {}
+
+    if cache is not None:
+        for key, werkzaamheid in lines.items():
+            # Keyed on the text that is scored (spelling-corrected), like find_best_matches_with_info
+            cache_keys[key] = match_cache_key(index, line_key(werkzaamheid), top_n, pruning)
+            cached = cache.get(cache_keys[key])
+            if cached is not None:
+                results[key] = _from_cache_value(index, cached)
+
+    missing = [key for key in lines if key not in results]
+    missing_lines = [lines[key] for key in missing]
+
+    def out_of_time() -> bool:
+        return deadline is not None and time.perf_counter() >= deadline
+
+    parallel = _parallel_enabled(len(missing))
+    computed = []
+    if parallel or engine == "batch":
+        round_size = len(missing)
+        if deadline is not None:
+            round_size = DEADLINE_ROUND_LINES * (config.MATCHER_WORKERS if parallel else 1)
+
+        # Lines scored in worker processes or in bulk count as find_best_matches calls too
+        with stage_timer("find_best_matches") as measurement:
+            for start in range(0, len(missing), max(1, round_size)):
+                if out_of_time():
+                    break
+                round_lines = missing_lines[start:start + round_size]
+                if parallel:
+                    try:
+                        from .parallel_matcher import find_best_matches_parallel
+                    except ImportError:
+                        from parallel_matcher import find_best_matches_parallel
+
+                    round_task = asyncio.ensure_future(
+                        find_best_matches_parallel(round_lines, index, top_n=top_n, engine=engine)
+                    )
+                    timeout = deadline - time.perf_counter() if deadline is not None else None
+                    done, _ = await asyncio.wait({round_task}, timeout=timeout)
+                    if not done:
+                        # Workers can't be interrupted: drop the round's result when it arrives
+                        round_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+                        break
+                    computed += round_task.result()
+                else:
+                    try:
+                        from .batch_matcher import find_best_matches_batch_with_info
+                    except ImportError:
+                        from batch_matcher import find_best_matches_batch_with_info
+
+                    computed += find_best_matches_batch_with_info(round_lines, index, top_n=top_n)
+            measurement["items_scored"] = sum(info["items_scored"] for _, info in computed)
+    else:
+        for werkzaamheid in missing_lines:
+            if out_of_time():
+                break
+            computed.append(find_best_matches_with_info(werkzaamheid, index, top_n=top_n, use_cache=False))
+
+    positions = {id(item): i for i, item in enumerate(index.items)} if cache is not None else None
+    for key, (matches, info) in zip(missing, computed):
+        results[key] = (matches, info)
+        if cache is not None:
+            cache.put(cache_keys[key], {
+                "matches": [[positions[id(item)], score, text_score, unit_score] for item, score, text_score, unit_score in matches],
+                "info": info
+            })
+
+    return results
+
+
+# Cascade tiers, in the order match_werkzaamheden tries them
+MATCH_TIERS = ("exact", "code", "learned", "fuzzy", "ai")
+
+# Prijzenboek codes are (mostly numeric) words of at least 6 characters
+CODE_PATTERN = re.compile(r"\b[0-9][0-9a-z\-]{5,}\b", re.IGNORECASE)
+
+
+@contextmanager
+def _tier_timer(tiers: Dict[str, Dict[str, Any]], name: str):
+    """Add the time spent in the block to a cascade tier"""
+    start = time.perf_counter()
+    try:
+        yield tiers[name]
+    finally:
+        tiers[name]["time_ms"] += (time.perf_counter() - start) * 1000
+
+
+def _direct_outcome(
+    item: Dict[str, Any],
+    werkzaamheid: Dict[str, Any],
+    confidence: float,
+    match_type: str,
+    index: PrijzenboekIndex
+) -> tuple:
+    """
+    Match outcome (as in match_werkzaamheden) for a direct hit
+    The alternatives for review come from the cheap keyword ranking of find_provisional_matches
+    """
+    unit_score = calculate_unit_score(werkzaamheid.get("eenheid", ""), item.get("eenheid", ""))
+    alternatives, _ = find_provisional_matches(werkzaamheid, index, top_n=5, max_candidates=None)
+    best_matches = [(item, confidence, 1.0, unit_score)] + [match for match in alternatives if match[0] is not item][:4]
+    return (best_matches, confidence, 1.0, unit_score, match_type, None, {"unit_fallback": False})
+
+
+def _exact_match_outcome(werkzaamheid: Dict[str, Any], index: PrijzenboekIndex) -> Optional[tuple]:
+    """Outcome for an item with exactly the same omschrijving, if the unit makes it a confident match"""
+    ids = exact_ids(index).get(normalize_text(werkzaamheid.get("omschrijving", "")))
+    if not ids:
+        return None
+
+    query_unit = normalize_unit(werkzaamheid.get("eenheid", ""))
+    best_id = max(ids, key=lambda i: (unit_score_normalized(query_unit, index.units[i]), -i))
+
+    # Text: 70%, Unit: 30%
+    confidence = 0.7 + unit_score_normalized(query_unit, index.units[best_id]) * 0.3
+    if confidence < AUTO_CONFIDENCE:
         return None
+    return _direct_outcome(index.items[best_id], werkzaamheid, confidence, "exact", index)
+
+
+def _code_match_outcome(werkzaamheid: Dict[str, Any], index: PrijzenboekIndex) -> Optional[tuple]:
+    """Outcome for a prijzenboek code written in the note (e.g. "3120011001 2x")"""
+    for word in CODE_PATTERN.findall(werkzaamheid.get("omschrijving", "")):
+        item = index.get_item_by_code(word)
+        if item is not None:
+            return _direct_outcome(item, werkzaamheid, 1.0, "code", index)
+    return None
+
+
+def _parallel_enabled(line_count: int) -> bool:
+    """Whether to shard matching over the process pool (see parallel_matcher)"""
+    if config is None:
+        return False
+    try:
+        from .parallel_matcher import should_use_parallel
+    except ImportError:
+        from parallel_matcher import should_use_parallel
+    return should_use_parallel(line_count)
 
 
 async def match_werkzaamheden(
     parsed_opname: Dict[str, Any],
-    prijzenboek: List[Dict[str, Any]],
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex],
     use_ai: bool = False,  # AI is now OFF by default - use on-demand instead
-    use_learning: bool = True
+    use_learning: bool = True,
+    engine: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    time_budget: Optional[float] = None,
+    progress: Optional[Callable[..., Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Match all werkzaamheden from opname with prijzenboek
     Supports AI-enhanced matching and learning from corrections
 
+    Every line goes through a cascade that stops at the first confident hit:
+    exact omschrijving, prijzenboek code in the note, learned correction,
+    indexed fuzzy matching and finally AI re-ranking
+
     Args:
         parsed_opname: Parsed opname document
-        prijzenboek: List of prijzenboek items
+        prijzenboek: PrijzenboekIndex or list of prijzenboek items
         use_ai: Whether to use AI matching (if available)
         use_learning: Whether to use learned corrections
+        engine: 'standard' (per line) or 'batch' (all lines at once),
+            defaults to config.MATCHER_ENGINE
+        stats: Optional dict, filled with matching statistics
+            (total_lines, unique_lines, learned_lines, scored_lines, corrected_lines,
+            pending_lines) and per cascade tier the lines it saw, its hits and time spent
+        time_budget: Optional time budget in seconds. Lines that are not
+            finished when it runs out get a cheap provisional match (keyword
+            ranking, no Levenshtein or AI) with status "pending", to be
+            refined later with refine_pending_matches
+        progress: Optional callback (lines matched, total lines, ai_in_flight=...),
+            e.g. a progress.ProgressReporter
 
     Returns:
         List of match results
     """
-    all_matches = []
+    return [
+        match async for match in iter_match_werkzaamheden(
+            parsed_opname, prijzenboek,
+            use_ai=use_ai, use_learning=use_learning, engine=engine,
+            stats=stats, time_budget=time_budget, progress=progress
+        )
+    ]
+
+
+async def iter_match_werkzaamheden(
+    parsed_opname: Dict[str, Any],
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex],
+    use_ai: bool = False,
+    use_learning: bool = True,
+    engine: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    time_budget: Optional[float] = None,
+    progress: Optional[Callable[..., Any]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Same as match_werkzaamheden, but yields every match result as soon as
+    it is known, in opname order (ruimte by ruimte)
+    The cheap tiers run for all lines first; fuzzy matching and AI run per
+    line when it is its turn (unless the batch engine scores them up front).
+    stats is filled once the last result has been yielded.
+    """
+    resumed = time.perf_counter()
+    busy = 0.0  # time spent matching, without the time the consumer holds on to a result
+    deadline = resumed + time_budget if time_budget is not None else None
+    prijzenboek = get_prijzenboek_index(prijzenboek)
+    engine = _resolve_engine(engine)
+
+    def out_of_time() -> bool:
+        return deadline is not None and time.perf_counter() >= deadline
 
     # Check if we should use AI matching
     ai_enabled = (
@@ -342,143 +1465,409 @@ async def match_werkzaamheden(
         config.LEARNING_ENABLED
     )
 
-    for ruimte in parsed_opname["ruimtes"]:
-        for werkzaamheid in ruimte["werkzaamheden"]:
-            match_type = "fuzzy"
-            ai_reasoning = None
-
-            # Step 1: Check for learned corrections first
-            if learning_enabled:
-                learned_item = check_learned_correction(werkzaamheid, prijzenboek)
+    top_n = config.MAX_CANDIDATES_FOR_AI if ai_enabled and config else 10
+
+    lines = [
+        (ruimte, werkzaamheid)
+        for ruimte in parsed_opname["ruimtes"]
+        for werkzaamheid in ruimte["werkzaamheden"]
+    ]
+
+    # Identical lines (e.g. "plinten verwijderen" in every room) are matched once
+    line_keys = [line_key(werkzaamheid) for _, werkzaamheid in lines]
+    unique = {}
+    for key, (_, werkzaamheid) in zip(line_keys, lines):
+        unique.setdefault(key, werkzaamheid)
+
+    # Matching cascade: every tier only sees the lines earlier tiers left unresolved
+    tiers = {name: {"lines": 0, "hits": 0, "time_ms": 0.0} for name in MATCH_TIERS}
+    outcomes = {}
+    learned_items = {}
+
+    # Tier 1: exact normalized omschrijving (hash lookup)
+    with _tier_timer(tiers, "exact") as tier:
+        for key, werkzaamheid in unique.items():
+            tier["lines"] += 1
+            outcome = _exact_match_outcome(werkzaamheid, prijzenboek)
+            if outcome:
+                outcomes[key] = outcome
+                tier["hits"] += 1
+
+    # Tier 2: prijzenboek code mentioned in the note
+    with _tier_timer(tiers, "code") as tier:
+        for key in [key for key in unique if key not in outcomes]:
+            tier["lines"] += 1
+            outcome = _code_match_outcome(unique[key], prijzenboek)
+            if outcome:
+                outcomes[key] = outcome
+                tier["hits"] += 1
+
+    # Tier 3: learned corrections
+    if learning_enabled:
+        with _tier_timer(tiers, "learned") as tier:
+            for key in [key for key in unique if key not in outcomes]:
+                tier["lines"] += 1
+                learned_item = check_learned_correction(unique[key], prijzenboek)
                 if learned_item:
-                    # Use learned match with 100% confidence
-                    match_result = {
-                        "id": str(uuid.uuid4()),
-                        "ruimte": ruimte["naam"],
-                        "opname_item": {
-                            "omschrijving": werkzaamheid["omschrijving"],
-                            "hoeveelheid": werkzaamheid["hoeveelheid"],
-                            "eenheid": werkzaamheid["eenheid"],
-                            "raw_text": werkzaamheid.get("raw_text", "")
-                        },
-                        "prijzenboek_match": {
-                            "code": learned_item["code"],
-                            "omschrijving": learned_item["omschrijving"],
-                            "omschrijving_offerte": learned_item.get("omschrijving_offerte", learned_item["omschrijving"]),
-                            "eenheid": learned_item["eenheid"],
-                            "materiaal": learned_item.get("materiaal", 0),
-                            "uren": learned_item.get("uren", 0),
-                            "prijs_per_stuk": learned_item.get("prijs_per_stuk", 0),
-                            "prijs_excl": learned_item.get("totaal_excl", learned_item.get("prijs_per_stuk", 0)),
-                            "prijs_incl": learned_item.get("totaal_incl", 0),
-                            "row_num": learned_item.get("row_num", None)
-                        },
-                        "confidence": 1.0,
-                        "text_score": 1.0,
-                        "unit_score": 1.0,
-                        "match_type": "learned",
-                        "ai_reasoning": "Match gebaseerd op eerdere gebruikerscorrecties",
-                        "status": "auto",
-                        "alternatives": []
-                    }
-                    all_matches.append(match_result)
-                    continue
-
-            # Step 2: Find best fuzzy matches
-            best_matches = find_best_matches(
-                werkzaamheid,
-                prijzenboek,
-                top_n=config.MAX_CANDIDATES_FOR_AI if ai_enabled and config else 10
+                    learned_items[key] = learned_item
+                    tier["hits"] += 1
+
+    pending = [key for key in unique if key not in outcomes and key not in learned_items]
+
+    # Tier 4 input: spelling correction of the remaining lines, scoring uses the corrected text
+    spelling = {}
+    scored_lines = {}
+    provisional = set()
+    lines_done = 0
+    ai_in_flight = 0
+
+    def scored_line(key):
+        if key not in scored_lines:
+            scored_lines[key] = unique[key]
+            if _spelling_correction_enabled():
+                scored_lines[key], spelling[key] = _correct_spelling(unique[key], prijzenboek)
+        return scored_lines[key]
+
+    # Batch engine / parallel mode: score all remaining lines up front
+    batch_results = None
+    if (engine == "batch" or _parallel_enabled(len(pending))) and not out_of_time():
+        with _tier_timer(tiers, "fuzzy"):
+            batch_results = await _find_best_matches_up_front(
+                {key: scored_line(key) for key in pending}, prijzenboek, top_n, engine, deadline
             )
 
-            if not best_matches:
-                continue
-
-            # Step 3: Apply AI matching if enabled and confidence is not high enough
-            best_item, confidence, text_score, unit_score = best_matches[0]
-
-            if ai_enabled and confidence < 0.95 and len(best_matches) > 1:
-                # Try AI matching for better results
-                try:
-                    ai_result = await apply_ai_matching(werkzaamheid, best_matches)
-                    if ai_result and ai_result.get("confidence", 0) >= config.AI_CONFIDENCE_THRESHOLD:
-                        # Use AI's choice
-                        ai_index = ai_result["best_match_index"]
-                        if 0 <= ai_index < len(best_matches):
-                            best_item, _, text_score, unit_score = best_matches[ai_index]
-                            confidence = ai_result["confidence"]
-                            match_type = "ai_semantic"
-                            ai_reasoning = ai_result.get("reasoning", "")
-
-                            # Reorder best_matches to put AI choice first
-                            ai_choice = best_matches.pop(ai_index)
-                            best_matches.insert(0, ai_choice)
-                except Exception as e:
-                    print(f"AI matching error for {werkzaamheid.get('omschrijving', '')}: {e}")
-
-            # Get alternative matches for user review
-            alternatives = [
-                {
-                    "code": item["code"],
-                    "omschrijving": item["omschrijving"],
-                    "eenheid": item["eenheid"],
-                    "prijs_excl": item.get("totaal_excl", item.get("prijs_per_stuk", 0)),
-                    "prijs_incl": item.get("totaal_incl", 0),
-                    "score": score
-                }
-                for item, score, _, _ in best_matches[1:5]
-            ]
-
-            match_result = {
-                "id": str(uuid.uuid4()),
-                "ruimte": ruimte["naam"],
-                "opname_item": {
-                    "omschrijving": werkzaamheid["omschrijving"],
-                    "hoeveelheid": werkzaamheid["hoeveelheid"],
-                    "eenheid": werkzaamheid["eenheid"],
-                    "raw_text": werkzaamheid.get("raw_text", "")
-                },
-                "prijzenboek_match": {
-                    "code": best_item["code"],
-                    "omschrijving": best_item["omschrijving"],
-                    "omschrijving_offerte": best_item.get("omschrijving_offerte", best_item["omschrijving"]),
-                    "eenheid": best_item["eenheid"],
-                    "materiaal": best_item.get("materiaal", 0),
-                    "uren": best_item.get("uren", 0),
-                    "prijs_per_stuk": best_item.get("prijs_per_stuk", 0),
-                    "prijs_excl": best_item.get("totaal_excl", best_item.get("prijs_per_stuk", 0)),
-                    "prijs_incl": best_item.get("totaal_incl", 0),
-                    "row_num": best_item.get("row_num", None)
-                },
-                "confidence": round(confidence, 3),
-                "text_score": round(text_score, 3),
-                "unit_score": round(unit_score, 3),
-                "match_type": match_type,
-                "ai_reasoning": ai_reasoning,
-                "status": "auto" if confidence >= 0.9 else "review",
-                "alternatives": alternatives
-            }
-
-            all_matches.append(match_result)
-
-    return all_matches
+    def fuzzy_match(key):
+        """Tier 4: indexed fuzzy matching, (best_matches, search_info) or None without candidates"""
+        with _tier_timer(tiers, "fuzzy") as tier:
+            tier["lines"] += 1
+            werkzaamheid = scored_line(key)
+            if batch_results is not None and key in batch_results:
+                best_matches, search_info = batch_results[key]
+            elif out_of_time():
+                # A cached match is still free, otherwise a cheap provisional one (refined later);
+                # lines left over by the up-front scoring were looked up there already
+                cached = None
+                if batch_results is None:
+                    cached = _cached_matches(prijzenboek, werkzaamheid, top_n, _pruning_enabled() and engine != "batch")
+                if cached is not None:
+                    best_matches, search_info = cached
+                else:
+                    best_matches, search_info = find_provisional_matches(werkzaamheid, prijzenboek, top_n=top_n)
+                    provisional.add(key)
+            else:
+                best_matches, search_info = find_best_matches_with_info(werkzaamheid, prijzenboek, top_n=top_n)
+        return (best_matches, search_info) if best_matches else None
+
+    def needs_ai(key, fuzzy) -> bool:
+        """Whether the fuzzy match is not confident enough (and AI may still run)"""
+        return (
+            ai_enabled and fuzzy is not None and key not in provisional and
+            fuzzy[0][0][1] < 0.95 and len(fuzzy[0]) > 1
+        )
+
+    async def ai_rerank(keys):
+        """Tier 5 call for a batch of lines: AI result per line, or None (no answer, error, timeout)"""
+        nonlocal ai_in_flight
+        batch = [(scored_line(key), fuzzy_results[key][0]) for key in keys]
+        if out_of_time():
+            # Keep the fuzzy matches for now, AI runs when the lines are refined
+            provisional.update(keys)
+            return [None] * len(keys)
+
+        # Every API call (a batch or a retry of one of its lines) takes its own
+        # slot of ai_semaphore and times out on its own, within the deadline
+        tiers["ai"]["lines"] += len(keys)
+        ai_in_flight += 1
+        if progress is not None:
+            progress(lines_done, len(lines), ai_in_flight=ai_in_flight)
+        results = [None] * len(keys)
+        try:
+            if len(batch) == 1:
+                results = [await apply_ai_matching(*batch[0], ai_semaphore, deadline)]
+            else:
+                results = await apply_ai_matching_batch(batch, ai_semaphore, deadline)
+        except Exception as e:
+            print(f"AI matching error for {len(keys)} line(s): {e}")
+        finally:
+            ai_in_flight -= 1
+
+        if out_of_time():
+            provisional.update(key for key, ai_result in zip(keys, results) if ai_result is None)
+        return results
+
+    def cascade_outcome(key, fuzzy, ai_result):
+        """Outcome of tiers 4 and 5 for a line (None without candidates)"""
+        if fuzzy is None:
+            return None
+
+        best_matches, search_info = fuzzy
+        match_type = "fuzzy"
+        ai_reasoning = None
+        best_item, confidence, text_score, unit_score = best_matches[0]
+
+        if ai_result and ai_result.get("confidence", 0) >= config.AI_CONFIDENCE_THRESHOLD:
+            # Use AI's choice
+            ai_index = ai_result["best_match_index"]
+            if 0 <= ai_index < len(best_matches):
+                best_item, _, text_score, unit_score = best_matches[ai_index]
+                confidence = ai_result["confidence"]
+                match_type = "ai_semantic"
+                ai_reasoning = ai_result.get("reasoning", "")
+                tiers["ai"]["hits"] += 1
+
+                # Reorder best_matches to put AI choice first
+                ai_choice = best_matches.pop(ai_index)
+                best_matches.insert(0, ai_choice)
+
+        if match_type == "fuzzy" and key not in provisional:
+            tiers["fuzzy"]["hits"] += 1
+        return (best_matches, confidence, text_score, unit_score, match_type, ai_reasoning, search_info)
+
+    # With AI: score all remaining lines first, then re-rank the uncertain ones
+    # AI_BATCH_SIZE lines per API call, at most AI_MAX_CONCURRENCY calls at a time
+    fuzzy_results = {}
+    ai_tasks = {}
+    ai_phase = None
+    if ai_enabled:
+        ai_semaphore = asyncio.Semaphore(max(1, config.AI_MAX_CONCURRENCY))
+        for key in pending:
+            fuzzy_results[key] = fuzzy_match(key)
+        ai_keys = [key for key in pending if needs_ai(key, fuzzy_results[key])]
+
+        batch_size = max(1, config.AI_BATCH_SIZE)
+        for start in range(0, len(ai_keys), batch_size):
+            batch_keys = ai_keys[start:start + batch_size]
+            task = asyncio.ensure_future(ai_rerank(batch_keys))
+            for position, key in enumerate(batch_keys):
+                ai_tasks[key] = (task, position)
+
+        async def run_ai_phase():
+            # Tier time is the wall time of all concurrent calls together
+            with _tier_timer(tiers, "ai"):
+                await asyncio.gather(*{task for task, _ in ai_tasks.values()}, return_exceptions=True)
+
+        if ai_tasks:
+            ai_phase = asyncio.ensure_future(run_ai_phase())
+
+    # Fan out to every occurrence with its own id, ruimte and hoeveelheid
+    try:
+        for key, (ruimte, werkzaamheid) in zip(line_keys, lines):
+            if key in learned_items:
+                # Use learned match with 100% confidence
+                result = _build_learned_result(ruimte["naam"], werkzaamheid, learned_items[key])
+            else:
+                if key not in outcomes:
+                    fuzzy = fuzzy_results[key] if key in fuzzy_results else fuzzy_match(key)
+                    ai_result = None
+                    if key in ai_tasks:
+                        task, position = ai_tasks[key]
+                        ai_result = (await task)[position]
+                    outcomes[key] = cascade_outcome(key, fuzzy, ai_result)
+                result = _outcome_result(ruimte, werkzaamheid, outcomes[key], spelling.get(key), key in provisional)
+
+            lines_done += 1
+            if progress is not None and progress(lines_done, len(lines), ai_in_flight=ai_in_flight):
+                # Let the event loop deliver the progress event
+                await asyncio.sleep(0)
+
+            if result is not None:
+                busy += time.perf_counter() - resumed
+                yield result
+                resumed = time.perf_counter()
+
+        if ai_phase is not None:
+            await ai_phase
+    finally:
+        # Consumer stopped early (e.g. closed stream): don't leave AI calls running
+        for task, _ in ai_tasks.values():
+            task.cancel()
+        if ai_phase is not None:
+            ai_phase.cancel()
+
+    busy += time.perf_counter() - resumed
+    record("match_werkzaamheden", calls=1, items_scored=len(lines), wall_ms=busy * 1000)
+
+    if stats is not None:
+        for tier in tiers.values():
+            tier["time_ms"] = round(tier["time_ms"], 3)
+        stats.update({
+            "total_lines": len(lines),
+            "unique_lines": len(unique),
+            "learned_lines": len(learned_items),
+            "scored_lines": len(pending),
+            "corrected_lines": sum(1 for info in spelling.values() if info),
+            "pending_lines": sum(1 for key in line_keys if key in provisional),
+            "tiers": tiers,
+        })
+
+
+def _outcome_result(
+    ruimte: Dict[str, Any],
+    werkzaamheid: Dict[str, Any],
+    outcome: Optional[tuple],
+    spelling: Optional[Dict[str, Any]],
+    pending: bool
+) -> Optional[Dict[str, Any]]:
+    """Match result of one line for its cascade outcome (None for a line without candidates)"""
+    if outcome is None:
+        return None
+
+    best_matches, confidence, text_score, unit_score, match_type, ai_reasoning, search_info = outcome
+    result = _build_match_result(
+        ruimte["naam"], werkzaamheid, best_matches,
+        confidence, text_score, unit_score,
+        match_type=match_type, ai_reasoning=ai_reasoning,
+        unit_fallback=search_info["unit_fallback"],
+        spelling=spelling
+    )
+    if pending:
+        result["status"] = "pending"
+    return result
+
+
+# Max items a provisional (out of time) match looks at
+PROVISIONAL_CANDIDATES = 200
+
+
+def _provisional_ids(
+    index: PrijzenboekIndex,
+    query_norm: str,
+    query_tokens: Set[str],
+    query_unit: str,
+    top_n: int,
+    limit: int
+) -> List[int]:
+    """
+    At most `limit` item ids for a provisional match, in prijzenboek order:
+    exact-text items, then the items of the rarest keyword postings. Too few
+    to fill the top N are topped up with unit-compatible items, then any
+    """
+    ids = set(exact_ids(index).get(query_norm, ()))
+    for token in sorted((t for t in query_tokens if t in index.postings), key=lambda t: len(index.postings[t])):
+        for i in index.postings[token]:
+            if len(ids) >= limit:
+                break
+            ids.add(i)
+
+    if len(ids) < top_n:
+        for fill in (index.compatible_id_list(query_unit), range(len(index.items))):
+            for i in fill:
+                if len(ids) >= limit:
+                    break
+                ids.add(i)
+
+    return sorted(ids)
+
+
+def find_provisional_matches(
+    werkzaamheid: Dict[str, Any],
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex],
+    top_n: int = 5,
+    max_candidates: Optional[int] = PROVISIONAL_CANDIDATES
+) -> Tuple[List[tuple], Dict[str, Any]]:
+    """
+    Cheap best-so-far matches for a line that ran out of time: keyword (BM25)
+    ranking without Levenshtein, same return value as find_best_matches_with_info
+    Only max_candidates items are ranked (see _provisional_ids), so the cost
+    per line doesn't grow with the prijzenboek; lines without keywords get
+    Levenshtein over those items. max_candidates=None ranks every item
+    sharing a keyword (and fully matches lines without keywords).
+    """
+    index = get_prijzenboek_index(prijzenboek)
+    omschrijving = werkzaamheid.get("omschrijving", "")
+    query_norm = normalize_text(omschrijving)
+    query_tokens = keyword_tokens(omschrijving)
+    query_unit = normalize_unit(werkzaamheid.get("eenheid", ""))
+
+    if max_candidates is None:
+        if not query_tokens:
+            return find_best_matches_with_info(werkzaamheid, index, top_n=top_n)
+        compatible = index.compatible_ids(query_unit) if _unit_partitioning_enabled() else None
+        matches, info = _find_best_matches_bm25(index, top_n, query_norm, query_tokens, query_unit, compatible)
+        return [match[:4] for match in matches], info
+
+    ids = _provisional_ids(index, query_norm, query_tokens, query_unit, top_n, max_candidates)
+    compatible = None
+    if _unit_partitioning_enabled():
+        compatible_units = {unit for unit in {index.units[i] for i in ids} if unit_score_normalized(query_unit, unit) > 0}
+        compatible = {i for i in ids if index.units[i] in compatible_units}
+
+    if query_tokens:
+        matches, info = _find_best_matches_bm25(
+            index, top_n, query_norm, query_tokens, query_unit, compatible, candidate_ids=ids
+        )
+        return [match[:4] for match in matches], info
+
+    top = _TopMatches(index, top_n, query_norm, query_tokens, query_unit)
+    top.offer(ids if compatible is None else [i for i in ids if i in compatible])
+    unit_fallback = compatible is not None and (top.offered < top_n or top.best_score() < _unit_fallback_score())
+    if unit_fallback:
+        top.offer([i for i in ids if i not in compatible])
+
+    info = {
+        "unit_fallback": unit_fallback,
+        "items_scored": top.offered,
+        "full_evaluations": top.full_evaluations,
+        "evaluations_skipped": top.offered - top.full_evaluations,
+    }
+    return [match[:4] for match in top.ranked()], info
+
+
+async def refine_pending_matches(
+    matches: List[Dict[str, Any]],
+    prijzenboek: Union[List[Dict[str, Any]], PrijzenboekIndex],
+    use_ai: bool = False,
+    use_learning: bool = True,
+    engine: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    time_budget: Optional[float] = None,
+    progress: Optional[Callable[..., Any]] = None
+) -> int:
+    """
+    Match the lines with status "pending" again and replace their results in place
+    (ids, ruimtes and hoeveelheden are kept). Returns the number of refined lines.
+    """
+    positions = {match["id"]: i for i, match in enumerate(matches) if match.get("status") == "pending"}
+    if not positions:
+        if stats is not None:
+            stats.update({"total_lines": 0, "pending_lines": 0})
+        return 0
+
+    opname = {
+        "ruimtes": [
+            {"naam": matches[i]["ruimte"], "werkzaamheden": [{**matches[i]["opname_item"], "match_id": match_id}]}
+            for match_id, i in positions.items()
+        ]
+    }
+    refined = await match_werkzaamheden(
+        opname, prijzenboek,
+        use_ai=use_ai, use_learning=use_learning, engine=engine,
+        stats=stats, time_budget=time_budget, progress=progress
+    )
+
+    for result in refined:
+        matches[positions[result["id"]]] = result
+    return len(refined)
 
 
 if __name__ == "__main__":
-    # Test matching
+    # Test matching (example opname against the prijzenboek database)
+    from pathlib import Path
     from document_parser import parse_docx_opname
-    from excel_parser import parse_prijzenboek
+    from database import PrijzenboekDB
+
+    backend_dir = Path(__file__).parent
 
     print("Loading documents...")
-    opname = parse_docx_opname("/home/user/vdsboffertes/Voorofscheweg_218_251107_094114.docx")
+    opname = parse_docx_opname(str(backend_dir.parent / "Voorofscheweg_218_251107_094114.docx"))
     print(f"Parsed opname: {len(opname['ruimtes'])} ruimtes")
 
     print("\nLoading prijzenboek...")
-    prijzenboek = parse_prijzenboek("/home/user/vdsboffertes/Opnamelijst_-_Woonforte_2025_22-04__Nieuw_.xlsm")
+    prijzenboek = PrijzenboekDB(str(backend_dir / "prijzenboek.db")).get_all_items()
     print(f"Parsed prijzenboek: {len(prijzenboek)} items")
 
     print("\nMatching...")
-    matches = match_werkzaamheden(opname, prijzenboek)
+    matches = asyncio.run(match_werkzaamheden(opname, prijzenboek, use_learning=False))
 
     print(f"\n{'='*80}")
     print(f"MATCHING RESULTS")
@@ -0,0 +1,111 @@
+"""
+Matcher instrumentation
+Calls, items scored, wall time and time spent in SQLite per stage
+(match_werkzaamheden, check_learned_correction, find_best_matches,
+apply_ai_matching). Every measurement goes to the process-wide registry and,
+inside a collect_metrics() block, also to the metrics of that request.
+SQLite time counts for the innermost stage that is running.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+
+class MetricsRegistry:
+    """Counters per stage"""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+
+    def add(self, stage: str, calls: int = 0, items_scored: int = 0, wall_ms: float = 0.0, sqlite_ms: float = 0.0):
+        """Add a measurement to a stage"""
+        with self._lock:
+            counters = self._stages.get(stage)
+            if counters is None:
+                counters = self._stages[stage] = {"calls": 0, "items_scored": 0, "wall_ms": 0.0, "sqlite_ms": 0.0}
+            counters["calls"] += calls
+            counters["items_scored"] += items_scored
+            counters["wall_ms"] += wall_ms
+            counters["sqlite_ms"] += sqlite_ms
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Counters per stage (times rounded to microseconds)"""
+        with self._lock:
+            return {
+                stage: {
+                    "calls": counters["calls"],
+                    "items_scored": counters["items_scored"],
+                    "wall_ms": round(counters["wall_ms"], 3),
+                    "sqlite_ms": round(counters["sqlite_ms"], 3),
+                }
+                for stage, counters in self._stages.items()
+            }
+
+    def reset(self):
+        """Clear all counters"""
+        with self._lock:
+            self._stages.clear()
+            self.started_at = datetime.now()
+
+
+_registry = MetricsRegistry()
+_request_metrics: ContextVar[Optional[MetricsRegistry]] = ContextVar("request_metrics", default=None)
+_current_stage: ContextVar[Optional[str]] = ContextVar("current_stage", default=None)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    return _registry
+
+
+def record(stage: str, calls: int = 0, items_scored: int = 0, wall_ms: float = 0.0, sqlite_ms: float = 0.0):
+    """Add a measurement to the process-wide registry and the current request"""
+    _registry.add(stage, calls, items_scored, wall_ms, sqlite_ms)
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.add(stage, calls, items_scored, wall_ms, sqlite_ms)
+
+
+@contextmanager
+def collect_metrics():
+    """Collect the measurements made inside the block (and the tasks it starts) per request"""
+    request_metrics = MetricsRegistry()
+    token = _request_metrics.set(request_metrics)
+    try:
+        yield request_metrics
+    finally:
+        _request_metrics.reset(token)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Time one call of a stage
+    Yields a dict in which the caller can set items_scored
+    """
+    measurement = {"items_scored": 0}
+    token = _current_stage.set(stage)
+    start = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        wall_ms = (time.perf_counter() - start) * 1000
+        _current_stage.reset(token)
+        record(stage, calls=1, items_scored=measurement["items_scored"], wall_ms=wall_ms)
+
+
+@contextmanager
+def sqlite_timer():
+    """Count the time spent in the block as SQLite time of the running stage"""
+    stage = _current_stage.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stage is not None:
+            record(stage, sqlite_ms=(time.perf_counter() - start) * 1000)
@@ -0,0 +1,141 @@
+"""
+Parallel matching over a process pool
+Shards werkzaamheden across worker processes so large opnames don't block
+the event loop. Every worker receives the PrijzenboekIndex once through the
+pool initializer; tasks only carry the werkzaamheden and return item ids.
+"""
+import asyncio
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    from .config import config
+    from .matcher import PrijzenboekIndex, find_best_matches_with_info
+except ImportError:
+    from config import config
+    from matcher import PrijzenboekIndex, find_best_matches_with_info
+
+
+# Worker process state (set by _init_worker)
+_worker_index: Optional[PrijzenboekIndex] = None
+_worker_positions: Dict[int, int] = {}
+
+# Parent process state
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_version: Optional[str] = None
+
+
+def _init_worker(index: PrijzenboekIndex):
+    """Pool initializer: keep the index for all tasks of this worker"""
+    global _worker_index, _worker_positions
+    _worker_index = index
+    _worker_positions = {id(item): i for i, item in enumerate(index.items)}
+
+
+def _match_shard(
+    werkzaamheden: List[Dict[str, Any]],
+    top_n: int,
+    engine: str
+) -> List[Tuple[List[tuple], Dict[str, Any]]]:
+    """
+    Worker task: best matches and search info for a shard of werkzaamheden
+    Matches are (item_id, score, text_score, unit_score) tuples, so item
+    dicts don't have to be pickled back to the parent
+    """
+    if engine == "batch":
+        try:
+            from .batch_matcher import find_best_matches_batch_with_info
+        except ImportError:
+            from batch_matcher import find_best_matches_batch_with_info
+        shard_matches = find_best_matches_batch_with_info(werkzaamheden, _worker_index, top_n=top_n)
+    else:
+        shard_matches = [
+            find_best_matches_with_info(werkzaamheid, _worker_index, top_n=top_n, use_cache=False)
+            for werkzaamheid in werkzaamheden
+        ]
+
+    return [
+        (
+            [(_worker_positions[id(item)], score, text_score, unit_score) for item, score, text_score, unit_score in matches],
+            info
+        )
+        for matches, info in shard_matches
+    ]
+
+
+def get_pool(index: PrijzenboekIndex) -> ProcessPoolExecutor:
+    """
+    Get the process pool for this prijzenboek version
+    The pool is recreated when the prijzenboek changes, since workers hold the index
+    """
+    global _pool, _pool_version
+
+    if _pool is not None and _pool_version != index.version:
+        shutdown_pool()
+
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=config.MATCHER_WORKERS,
+            initializer=_init_worker,
+            initargs=(index,)
+        )
+        _pool_version = index.version
+
+    return _pool
+
+
+def shutdown_pool():
+    """Shut down the process pool (on app shutdown or prijzenboek change)"""
+    global _pool, _pool_version
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_version = None
+
+
+def should_use_parallel(line_count: int) -> bool:
+    """
+    Match in the process pool from PARALLEL_MIN_LINES lines on; even a single
+    worker keeps the event loop free while a large opname is scored
+    """
+    return config.MATCHER_WORKERS >= 1 and line_count >= config.PARALLEL_MIN_LINES
+
+
+async def find_best_matches_parallel(
+    werkzaamheden: List[Dict[str, Any]],
+    index: PrijzenboekIndex,
+    top_n: int = 5,
+    engine: str = "standard"
+) -> List[Tuple[List[tuple], Dict[str, Any]]]:
+    """
+    Find top N best matches for every werkzaamheid using the process pool
+    Returns one (matches, search_info) pair per werkzaamheid, in input order,
+    like matcher.find_best_matches_with_info
+    """
+    if not werkzaamheden:
+        return []
+
+    pool = get_pool(index)
+    loop = asyncio.get_running_loop()
+
+    shard_size = math.ceil(len(werkzaamheden) / config.MATCHER_WORKERS)
+    shards = [
+        werkzaamheden[start:start + shard_size]
+        for start in range(0, len(werkzaamheden), shard_size)
+    ]
+
+    shard_results = await asyncio.gather(*[
+        loop.run_in_executor(pool, _match_shard, shard, top_n, engine)
+        for shard in shards
+    ])
+
+    # Merge back in original order
+    return [
+        (
+            [(index.items[i], score, text_score, unit_score) for i, score, text_score, unit_score in matches],
+            info
+        )
+        for shard in shard_results
+        for matches, info in shard
+    ]
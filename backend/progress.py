@@ -0,0 +1,116 @@
+"""
+Progress events per session
+Long-running stages (prijzenboek parsing, matching, AI calls, Excel
+generation) report through a ProgressReporter; every subscriber of the
+session (the /ws/progress/{session_id} WebSocket) gets the events.
+Reporters are rate-limited so hot loops can call them for every row.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Optional, Set, Tuple
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+
+# Events a slow subscriber may fall behind before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class ProgressHub:
+    """Subscriber queues per session_id; publish is safe from worker threads"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        """Queue receiving the events of a session (call from the event loop)"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(session_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        """Stop sending events to a queue"""
+        with self._lock:
+            subscribers = self._subscribers.get(session_id, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(session_id, None)
+
+    def has_subscribers(self, session_id: str) -> bool:
+        return session_id in self._subscribers
+
+    def publish(self, session_id: str, event: Dict[str, Any]):
+        """Send an event to every subscriber of the session"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_put, queue, event)
+
+
+def _put(queue: asyncio.Queue, event: Dict[str, Any]):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+class ProgressReporter:
+    """
+    Progress of one stage of a session, e.g. ProgressReporter(session_id, "match", total=104)
+    Call it with the number of units done (plus optional details such as
+    ai_in_flight); an event is published at most every PROGRESS_INTERVAL_SECONDS,
+    and always when the stage is done (done == total)
+    """
+
+    def __init__(self, session_id: str, stage: str, total: Optional[int] = None, hub: ProgressHub = None):
+        self.session_id = session_id
+        self.stage = stage
+        self.total = total
+        self.done = 0
+        self.details: Dict[str, Any] = {}
+        self.interval = config.PROGRESS_INTERVAL_SECONDS
+        self.hub = hub or get_progress_hub()
+        self._last_publish = 0.0
+
+    def __call__(self, done: int, total: Optional[int] = None, **details) -> bool:
+        """Report progress, returns whether an event was published"""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if details:
+            self.details.update(details)
+
+        finished = self.total is not None and done >= self.total
+        now = time.monotonic()
+        if not finished and now - self._last_publish < self.interval:
+            return False
+        if not self.hub.has_subscribers(self.session_id):
+            return False
+
+        self._last_publish = now
+        self.hub.publish(self.session_id, {
+            "session_id": self.session_id,
+            "stage": self.stage,
+            "done": done,
+            "total": self.total,
+            "finished": finished,
+            **self.details,
+        })
+        return True
+
+
+_progress_hub_instance = None
+
+
+def get_progress_hub() -> ProgressHub:
+    """Get the process-wide progress hub"""
+    global _progress_hub_instance
+    if _progress_hub_instance is None:
+        _progress_hub_instance = ProgressHub()
+    return _progress_hub_instance
@@ -0,0 +1,179 @@
+"""
+Spelling correction for opname text
+SymSpell-style: every word of the prijzenboek vocabulary (plus the
+construction synonyms) is stored under all its deletes up to the max edit
+distance, so correcting a word is a few dictionary lookups instead of an
+edit distance against every item.
+"""
+import re
+from typing import List, Dict, Any, Set, Tuple
+
+try:
+    from .config import config
+    from .matcher import PrijzenboekIndex, CONSTRUCTION_SYNONYMS
+except ImportError:
+    from config import config
+    from matcher import PrijzenboekIndex, CONSTRUCTION_SYNONYMS
+
+
+WORD_PATTERN = re.compile(r"[a-zà-ÿ]+", re.IGNORECASE)
+
+# Shortest vocabulary word
+MIN_WORD_LENGTH = 4
+
+# Shorter opname words are left alone: they often are valid words that just
+# don't occur in the prijzenboek ("legen" would become "lagen")
+MIN_CORRECTION_LENGTH = 6
+
+# Words shorter than this are only corrected at distance 1 (distance 2 turns
+# "gordingen" into "gordijnen")
+MIN_LENGTH_DISTANCE_2 = 12
+
+
+# Dutch plural and inflection endings: a word that differs from a vocabulary
+# word only by one of these is spelled correctly ("renovatie" / "renovaties")
+INFLECTION_SUFFIXES = ("s", "'s", "e", "n", "en", "es")
+
+VOWELS = set("aeiou")
+
+
+def _inflections(word: str) -> Set[str]:
+    """Other inflections of a word: with or without an ending, incl. consonant/vowel doubling (pot/potten, raam/ramen)"""
+    variants = {word + suffix for suffix in INFLECTION_SUFFIXES}
+    if len(word) >= 3:
+        # pot -> potten, raam -> ramen
+        variants.add(word + word[-1] + "en")
+        if word[-2] == word[-3] and word[-2] in VOWELS:
+            variants.add(word[:-2] + word[-1] + "en")
+
+    for suffix in INFLECTION_SUFFIXES:
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            stem = word[:-len(suffix)]
+            variants.add(stem)
+            if suffix == "en":
+                # potten -> pot, ramen -> raam
+                if stem[-1] == stem[-2]:
+                    variants.add(stem[:-1])
+                if stem[-2] in VOWELS:
+                    variants.add(stem[:-1] + stem[-2] + stem[-1])
+    variants.discard(word)
+    return variants
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """All strings reachable from word by deleting up to max_distance characters"""
+    deletes = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        deletes |= frontier
+    return deletes
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)"""
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        previous_previous, previous = previous, current
+    return previous[len(b)]
+
+
+class SpellingCorrector:
+    """Corrects words against a vocabulary using a precomputed delete dictionary"""
+
+    def __init__(self, vocabulary: Dict[str, int], max_distance: int = 2):
+        self.vocabulary = vocabulary
+        self.max_distance = max_distance
+        self.deletes: Dict[str, List[str]] = {}
+        for word in vocabulary:
+            for deleted in _deletes(word, max_distance):
+                self.deletes.setdefault(deleted, []).append(word)
+
+    @classmethod
+    def from_index(cls, index: PrijzenboekIndex, max_distance: int = 2) -> "SpellingCorrector":
+        """Vocabulary (with frequencies) of the prijzenboek omschrijvingen plus the construction synonyms"""
+        vocabulary: Dict[str, int] = {}
+        for text in index.normalized:
+            for word in WORD_PATTERN.findall(text):
+                if len(word) >= MIN_WORD_LENGTH:
+                    vocabulary[word] = vocabulary.get(word, 0) + 1
+        for key, synonyms in CONSTRUCTION_SYNONYMS.items():
+            for word in [key] + synonyms:
+                if len(word) >= MIN_WORD_LENGTH and " " not in word:
+                    vocabulary.setdefault(word, 1)
+        return cls(vocabulary, max_distance)
+
+    def correct_word(self, word: str) -> str:
+        """Closest vocabulary word (most frequent on ties), or the word itself"""
+        word = word.lower()
+        if len(word) < MIN_CORRECTION_LENGTH or word in self.vocabulary:
+            return word
+
+        # Another inflection of a known word is no typo
+        if any(variant in self.vocabulary for variant in _inflections(word)):
+            return word
+
+        max_distance = self.max_distance if len(word) >= MIN_LENGTH_DISTANCE_2 else min(1, self.max_distance)
+
+        candidates = set()
+        for deleted in _deletes(word, max_distance):
+            candidates.update(self.deletes.get(deleted, ()))
+
+        best = None
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = edit_distance(word, candidate)
+            if distance <= max_distance:
+                rank = (distance, -self.vocabulary[candidate], candidate)
+                if best is None or rank < best:
+                    best = rank
+
+        return best[2] if best else word
+
+    def correct(self, text: str) -> Tuple[str, Dict[str, str]]:
+        """Corrected text (original casing of first letters kept) and the corrections made"""
+        corrections: Dict[str, str] = {}
+
+        def replace(match):
+            word = match.group(0)
+            corrected = self.correct_word(word)
+            if corrected == word.lower():
+                return word
+            corrections[word] = corrected
+            return corrected.capitalize() if word[0].isupper() else corrected
+
+        return WORD_PATTERN.sub(replace, text), corrections
+
+
+def get_spelling_corrector(index: PrijzenboekIndex) -> SpellingCorrector:
+    """Get the spelling corrector for a prijzenboek (cached on the PrijzenboekIndex)"""
+    corrector = index.cache.get("spelling")
+    if corrector is None or corrector.max_distance != config.SPELLING_MAX_EDIT_DISTANCE:
+        corrector = SpellingCorrector.from_index(index, config.SPELLING_MAX_EDIT_DISTANCE)
+        index.cache["spelling"] = corrector
+    return corrector
+
+
+def correct_werkzaamheid(werkzaamheid: Dict[str, Any], index: PrijzenboekIndex) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Spelling-corrected copy of a werkzaamheid for scoring, and the spelling
+    info for the match result (None when nothing was corrected)
+    """
+    original = werkzaamheid.get("omschrijving", "")
+    corrected, corrections = get_spelling_corrector(index).correct(original)
+    if not corrections:
+        return werkzaamheid, None
+
+    return {**werkzaamheid, "omschrijving": corrected}, {
+        "original": original,
+        "corrected": corrected,
+        "corrections": corrections,
+    }
@@ -0,0 +1,184 @@
+"""
+Hashed n-gram vector engine
+Embeds opname lines and prijzenboek items as TF-IDF vectors of hashed word
+(synonym-expanded) and character n-gram features, so paraphrases and
+misspellings still land close to their prijzenboek item without an API call.
+All item vectors live in one L2-normalized matrix: top-k retrieval for a
+line is a single matrix-vector product. The matrix is persisted next to
+prijzenboek.db in a file named after the prijzenboek version and dimensions,
+and reused while the prijzenboek version is unchanged.
+"""
+import math
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import List, Dict, Optional
+
+try:
+    import numpy as np
+    VECTOR_ENGINE_AVAILABLE = True
+except ImportError:
+    VECTOR_ENGINE_AVAILABLE = False
+    np = None
+
+try:
+    from .config import config
+    from .matcher import PrijzenboekIndex, normalize_text, keyword_tokens
+except ImportError:
+    from config import config
+    from matcher import PrijzenboekIndex, normalize_text, keyword_tokens
+
+
+VECTOR_INDEX_DIR = Path(__file__).parent
+VECTOR_INDEX_PREFIX = "prijzenboek_vectors_"
+
+# Character n-gram sizes (within words, padded with spaces)
+CHAR_NGRAM_SIZES = (3, 4, 5)
+
+
+def hashed_features(text: str, dimensions: int) -> Dict[int, float]:
+    """Sublinear term frequencies of the hashed word and character n-gram features of a text"""
+    counts: Dict[int, int] = {}
+
+    features = [f"w:{token}" for token in keyword_tokens(text)]
+    for word in normalize_text(text).split():
+        padded = f" {word} "
+        for size in CHAR_NGRAM_SIZES:
+            features.extend(f"c:{padded[i:i + size]}" for i in range(len(padded) - size + 1))
+
+    for feature in features:
+        bucket = zlib.crc32(feature.encode()) % dimensions
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+    return {bucket: 1 + math.log(count) for bucket, count in counts.items()}
+
+
+class VectorIndex:
+    """L2-normalized TF-IDF matrix (items x dimensions) of a prijzenboek version"""
+
+    def __init__(self, version: str, idf: "np.ndarray", matrix: "np.ndarray"):
+        self.version = version
+        self.idf = idf
+        self.matrix = matrix
+        self.dimensions = len(idf)
+
+    @classmethod
+    def build(cls, index: PrijzenboekIndex, dimensions: int) -> "VectorIndex":
+        """Embed every prijzenboek item"""
+        features = [hashed_features(item.get("omschrijving", ""), dimensions) for item in index.items]
+
+        document_frequency = np.zeros(dimensions, dtype=np.float32)
+        for item_features in features:
+            document_frequency[list(item_features)] += 1
+        idf = (np.log((1 + len(features)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        matrix = np.zeros((len(features), dimensions), dtype=np.float32)
+        for row, item_features in enumerate(features):
+            if item_features:
+                matrix[row, list(item_features)] = list(item_features.values())
+        matrix *= idf
+        _normalize_rows(matrix)
+
+        return cls(index.version, idf, matrix)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["VectorIndex"]:
+        """Load a persisted vector index, or None if there is none"""
+        if not Path(path).exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return cls(str(data["version"]), data["idf"], data["matrix"])
+
+    def save(self, path: Path):
+        """
+        Persist the vector index
+        Written to a temp file and renamed into place, so a crash or a
+        concurrent writer never leaves a half-written file at path
+        """
+        path = Path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, version=np.array(self.version), idf=self.idf, matrix=self.matrix)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """L2-normalized query vectors (texts x dimensions)"""
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = hashed_features(text, self.dimensions)
+            if features:
+                vectors[row, list(features)] = list(features.values())
+        vectors *= self.idf
+        _normalize_rows(vectors)
+        return vectors
+
+    def scores(self, text: str) -> "np.ndarray":
+        """Cosine similarity (0..1) of a text with every item"""
+        return self.matrix @ self.embed([text])[0]
+
+
+def _normalize_rows(matrix: "np.ndarray"):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+
+def top_ids(scores: "np.ndarray", k: int) -> List[int]:
+    """Ids of the k highest scores (with a positive score), in prijzenboek order"""
+    if k < len(scores):
+        ids = np.argpartition(-scores, k - 1)[:k]
+    else:
+        ids = np.arange(len(scores))
+    return sorted(int(i) for i in ids if scores[i] > 0)
+
+
+def vector_index_path(version: str, dimensions: int) -> Path:
+    """Persisted vector index file of a prijzenboek version"""
+    return VECTOR_INDEX_DIR / f"{VECTOR_INDEX_PREFIX}{version}_{dimensions}.npz"
+
+
+def _remove_stale_vector_indexes(keep: Path):
+    """Remove vector index files of other prijzenboek versions"""
+    for path in VECTOR_INDEX_DIR.glob(f"{VECTOR_INDEX_PREFIX}*.npz"):
+        if path != keep:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def get_vector_index(index: PrijzenboekIndex) -> Optional[VectorIndex]:
+    """
+    Get the vector index of a prijzenboek (cached on the PrijzenboekIndex)
+    Loaded from disk when the persisted one matches the prijzenboek version
+    and dimensions, otherwise built and persisted. None when disabled or numpy is missing.
+    """
+    if not VECTOR_ENGINE_AVAILABLE or not config.VECTOR_ENGINE_ENABLED:
+        return None
+
+    vectors = index.cache.get("vectors")
+    if vectors is not None and vectors.dimensions == config.VECTOR_DIMENSIONS:
+        return vectors
+
+    path = vector_index_path(index.version, config.VECTOR_DIMENSIONS)
+    vectors = None
+    try:
+        vectors = VectorIndex.load(path)
+    except Exception as e:
+        print(f"Error loading vector index: {e}")
+
+    if vectors is None or vectors.version != index.version or vectors.dimensions != config.VECTOR_DIMENSIONS:
+        vectors = VectorIndex.build(index, config.VECTOR_DIMENSIONS)
+        try:
+            vectors.save(path)
+            _remove_stale_vector_indexes(keep=path)
+        except Exception as e:
+            print(f"Error saving vector index: {e}")
+
+    index.cache["vectors"] = vectors
+    return vectors
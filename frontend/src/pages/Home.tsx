@@ -103,6 +103,10 @@ export default function Home() {
         return <Badge variant="info" className="bg-purple-100 text-purple-700">AI</Badge>;
       case 'learned':
         return <Badge variant="info" className="bg-cyan-100 text-cyan-700">Geleerd</Badge>;
+      case 'exact':
+        return <Badge variant="info" className="bg-green-100 text-green-700">Exact</Badge>;
+      case 'code':
+        return <Badge variant="info" className="bg-green-100 text-green-700">Code</Badge>;
       case 'manual':
         return <Badge variant="default">Handmatig</Badge>;
       default:
@@ -372,6 +376,11 @@ function MatchItem({ match, onMatchChange, onAISuggestion, getConfidenceBadge, g
           <div className="text-sm font-medium text-gray-900">
             {match.opname_item.hoeveelheid} {match.opname_item.eenheid} | {match.opname_item.omschrijving}
           </div>
+          {match.spelling && (
+            <div className="text-xs text-gray-500 mt-1">
+              Gelezen als: {match.spelling.corrected}
+            </div>
+          )}
         </div>
 
         <div className="flex items-center justify-center text-orange-500">
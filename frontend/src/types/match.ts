@@ -24,14 +24,22 @@ export interface Alternative {
   score: number;
 }
 
+export interface SpellingCorrection {
+  original: string;
+  corrected: string;
+  corrections: Record<string, string>;
+}
+
 export interface Match {
   id: string;
   ruimte: string;
   opname_item: OpnameItem;
   prijzenboek_match: PrijzenboekItem;
   confidence: number;
-  match_type: 'ai_semantic' | 'learned' | 'manual' | 'fuzzy';
+  match_type: 'exact' | 'code' | 'ai_semantic' | 'learned' | 'manual' | 'fuzzy';
+  status?: 'auto' | 'review' | 'pending';
   ai_reasoning?: string;
+  spelling?: SpellingCorrection | null;
   alternatives?: Alternative[];
 }
 
@@ -41,6 +49,7 @@ export interface MatchResult {
   high_confidence: number;
   medium_confidence: number;
   low_confidence: number;
+  pending?: number;
   matches: Match[];
 }
 